@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+The MetadataWizard(pymdwizard) software was developed by the
+U.S. Geological Survey Fort Collins Science Center.
+See: https://github.com/usgs/fort-pymdwizard for current project source code
+See: https://usgs.github.io/fort-pymdwizard/ for current user documentation
+See: https://github.com/usgs/fort-pymdwizard/tree/master/examples
+    for examples of use in other scripts
+
+License:            Creative Commons Attribution 4.0 International (CC BY 4.0)
+                    http://creativecommons.org/licenses/by/4.0/
+
+PURPOSE
+------------------------------------------------------------------------------
+Headless batch validation of directories of CSDGM (FGDC) XML records.
+Results can be written to CSV, JSON Lines or a pandas dataframe, and are
+cached on disk by file content so unchanged records are not re-validated.
+
+Can also be run from the command line, e.g.:
+    python -m pymdwizard.core.batch_utils c:/temp/records --schema bdp
+        --out results.csv --cache results_cache.sqlite
+
+
+SCRIPT DEPENDENCIES
+------------------------------------------------------------------------------
+    This script is part of the pymdwizard package and is not intented to be
+    used independently.  All pymdwizard package requirements are needed.
+    
+    See imports section for external packages used in this script as well as
+    inter-package dependencies
+
+
+U.S. GEOLOGICAL SURVEY DISCLAIMER
+------------------------------------------------------------------------------
+This software has been approved for release by the U.S. Geological Survey 
+(USGS). Although the software has been subjected to rigorous review,
+the USGS reserves the right to update the software as needed pursuant to
+further analysis and review. No warranty, expressed or implied, is made by
+the USGS or the U.S. Government as to the functionality of the software and
+related material nor shall the fact of release constitute any such warranty.
+Furthermore, the software is released on condition that neither the USGS nor
+the U.S. Government shall be held liable for any damages resulting from
+its authorized or unauthorized use.
+
+Any use of trade, product or firm names is for descriptive purposes only and
+does not imply endorsement by the U.S. Geological Survey.
+
+Although this information product, for the most part, is in the public domain,
+it also contains copyrighted material as noted in the text. Permission to
+reproduce copyrighted items for other than personal use must be secured from
+the copyright owner.
+------------------------------------------------------------------------------
+"""
+
+import os
+import csv
+import json
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing
+
+import pandas as pd
+from lxml import etree
+
+from pymdwizard.core import xml_utils
+from pymdwizard.core import fgdc_utils
+
+import pymdwizard
+
+RESULT_COLUMNS = ["fname", "valid", "xpath", "message", "line number"]
+
+
+class ValidationCache(object):
+    """
+    On disk (sqlite) store of validation results, keyed by the sha256 hash
+    of a file's contents and the schema it was validated against.
+    """
+
+    def __init__(self, fname):
+        """
+        Parameters
+        ----------
+        fname : str
+                file path/name of the sqlite database to use,
+                it will be created if it does not exist.
+        """
+        self.fname = fname
+        self.connection = sqlite3.connect(fname)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "content_hash TEXT, schema_key TEXT, errors TEXT, "
+            "PRIMARY KEY (content_hash, schema_key))"
+        )
+        self.connection.commit()
+
+    def get(self, content_hash, schema_key):
+        """
+        Return the cached errors for a file, or None if it is not cached
+
+        Parameters
+        ----------
+        content_hash : str
+        schema_key : str
+
+        Returns
+        -------
+            list of tuples (xpath, error message, line number) or None
+        """
+        row = self.connection.execute(
+            "SELECT errors FROM results WHERE content_hash=? AND schema_key=?",
+            (content_hash, schema_key),
+        ).fetchone()
+        if row is None:
+            return None
+        return [tuple(error) for error in json.loads(row[0])]
+
+    def put(self, content_hash, schema_key, errors):
+        """
+        Store the errors for a file
+
+        Parameters
+        ----------
+        content_hash : str
+        schema_key : str
+        errors : list of tuples (xpath, error message, line number)
+
+        Returns
+        -------
+            None
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            (content_hash, schema_key, json.dumps(errors)),
+        )
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+def hash_file(fname, blocksize=1 << 20):
+    """
+    Return the sha256 hex digest of a file's contents
+
+    Parameters
+    ----------
+    fname : str
+    blocksize : int, optional
+            number of bytes to read at a time
+
+    Returns
+    -------
+        str
+    """
+    sha = hashlib.sha256()
+    with open(fname, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_schema_key(schema="fgdc"):
+    """
+    Returns the key used to identify a schema in the validation cache.
+    Includes the schema's modification time and the pymdwizard version so
+    that cached results are not reused after either changes.
+
+    Parameters
+    ----------
+    schema : str
+            'fgdc', 'bdp' or the full file path to another local schema.
+
+    Returns
+    -------
+        str
+    """
+    xsd_fname = fgdc_utils.get_schema_fname(schema)
+    return "{}|{}|{}".format(
+        xsd_fname, os.path.getmtime(xsd_fname), pymdwizard.__version__
+    )
+
+
+def validate_file(fname, schema="fgdc"):
+    """
+    Validate a single file, reporting unreadable or malformed files as
+    errors rather than raising.
+
+    Line numbers refer to the file itself (it is validated in place).
+
+    Parameters
+    ----------
+    fname : str
+            file path/name of the xml record to validate
+    schema : str
+            'fgdc', 'bdp' or the full file path to another local schema.
+
+    Returns
+    -------
+        list of tuples
+        (xpath, error message, line number)
+    """
+    try:
+        xml_doc = xml_utils.fname_to_node(fname)
+    except etree.XMLSyntaxError as e:
+        return [("Unknown", "XML syntax error: {}".format(e), e.lineno)]
+    except (OSError, ValueError) as e:
+        return _read_errors(e)
+
+    return fgdc_utils.validate_xml(xml_doc, schema, reparse=False)
+
+
+def _read_errors(e):
+    return [("Unknown", "Could not read file: {}".format(e), 0)]
+
+
+def _validate_job(job):
+    fname, schema = job
+    return fname, validate_file(fname, schema)
+
+
+def _map_jobs(jobs, schema, processes):
+    if processes == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _validate_job(job)
+    else:
+        pool = multiprocessing.Pool(
+            processes, initializer=fgdc_utils.warm_schema_cache, initargs=([schema],)
+        )
+        try:
+            for result in pool.imap_unordered(_validate_job, jobs, chunksize=8):
+                yield result
+        finally:
+            pool.terminate()
+
+
+def validate_files(
+    locator, schema="fgdc", processes=None, cache_fname=None, recursive=True
+):
+    """
+    Validate many xml records, in parallel, yielding the results for each
+    file as they become available.
+
+    Files whose contents and schema match an entry in the cache are not
+    validated again.
+
+    Parameters
+    ----------
+    locator : str or list of str
+            directory, glob pattern, file name or list of these.
+            See xml_utils.find_xml_files
+    schema : str, optional
+            'fgdc', 'bdp' or the full file path to another local schema.
+    processes : int, optional
+            Number of worker processes to use, defaults to the number of cpus
+            1 validates everything in the current process.
+    cache_fname : str, optional
+            file path/name of the sqlite result cache to use.
+            If not provided no caching is done.
+    recursive : bool, optional
+            Whether to include files in subdirectories
+
+    Returns
+    -------
+        generator of tuples (fname, list of errors)
+        Where each error is a tuple of (xpath, error message, line number).
+        Results from the cache are yielded first, the order of the others
+        is not guaranteed.
+    """
+    fnames = xml_utils.find_xml_files(locator, recursive=recursive)
+
+    if cache_fname is None:
+        cache = None
+    else:
+        cache = ValidationCache(cache_fname)
+        schema_key = get_schema_key(schema)
+
+    try:
+        jobs = []
+        content_hashes = {}
+        for fname in fnames:
+            if cache is not None:
+                try:
+                    content_hashes[fname] = hash_file(fname)
+                except OSError as e:
+                    # e.g. removed since it was listed
+                    yield fname, _read_errors(e)
+                    continue
+                errors = cache.get(content_hashes[fname], schema_key)
+                if errors is not None:
+                    yield fname, errors
+                    continue
+            jobs.append((fname, schema))
+
+        for i, (fname, errors) in enumerate(_map_jobs(jobs, schema, processes)):
+            if cache is not None:
+                cache.put(content_hashes[fname], schema_key, errors)
+                if i % 100 == 99:
+                    cache.connection.commit()
+            yield fname, errors
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def iter_result_rows(results):
+    """
+    Flatten the output of validate_files into one dictionary per error.
+    Files without any errors get a single row with valid set to True.
+
+    Parameters
+    ----------
+    results : iterable of tuples (fname, list of errors)
+
+    Returns
+    -------
+        generator of dict, with keys RESULT_COLUMNS
+    """
+    for fname, errors in results:
+        if not errors:
+            yield dict(zip(RESULT_COLUMNS, [fname, True, "", "", None]))
+        for xpath, message, line in errors:
+            yield dict(zip(RESULT_COLUMNS, [fname, False, xpath, message, line]))
+
+
+def write_csv(results, fname):
+    """
+    Stream the output of validate_files to a CSV file
+
+    Parameters
+    ----------
+    results : iterable of tuples (fname, list of errors)
+    fname : str
+            file path/name of the CSV to write
+
+    Returns
+    -------
+        int : the number of files written
+    """
+    count = 0
+    with open(fname, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for result in results:
+            writer.writerows(iter_result_rows([result]))
+            count += 1
+    return count
+
+
+def write_jsonl(results, fname):
+    """
+    Stream the output of validate_files to a JSON Lines file,
+    one line per file.
+
+    Parameters
+    ----------
+    results : iterable of tuples (fname, list of errors)
+    fname : str
+            file path/name of the JSON Lines file to write
+
+    Returns
+    -------
+        int : the number of files written
+    """
+    count = 0
+    with open(fname, "w", encoding="utf-8") as f:
+        for result_fname, errors in results:
+            line = {
+                "fname": result_fname,
+                "valid": not errors,
+                "errors": [dict(zip(RESULT_COLUMNS[2:], e)) for e in errors],
+            }
+            f.write(json.dumps(line) + "\n")
+            count += 1
+    return count
+
+
+def results_to_dataframe(results):
+    """
+    Collect the output of validate_files into a pandas dataframe
+
+    Parameters
+    ----------
+    results : iterable of tuples (fname, list of errors)
+
+    Returns
+    -------
+        pandas dataframe, with columns RESULT_COLUMNS
+    """
+    return pd.DataFrame.from_records(
+        list(iter_result_rows(results)), columns=RESULT_COLUMNS
+    )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Batch validate CSDGM records")
+    parser.add_argument(
+        "locator", help="Directory, glob pattern or file(s) to validate", nargs="+"
+    )
+    parser.add_argument(
+        "--schema", help="'fgdc', 'bdp' or the path to an xsd", default="fgdc"
+    )
+    parser.add_argument(
+        "--out",
+        help="Output file, .csv or .jsonl, summary printed if not provided",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache", help="sqlite file used to cache results", default=None
+    )
+    parser.add_argument(
+        "--processes", help="Number of worker processes", type=int, default=None
+    )
+    args = parser.parse_args()
+
+    results = validate_files(
+        args.locator,
+        schema=args.schema,
+        processes=args.processes,
+        cache_fname=args.cache,
+    )
+
+    if args.out is None:
+        for fname, errors in results:
+            print("{}\t{} errors".format(fname, len(errors)))
+    elif args.out.lower().endswith(".csv"):
+        print("{} files validated".format(write_csv(results, args.out)))
+    else:
+        print("{} files validated".format(write_jsonl(results, args.out)))
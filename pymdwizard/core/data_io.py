@@ -47,21 +47,12 @@ the copyright owner.
 ------------------------------------------------------------------------------
 """
 
+import csv
+import codecs
 import struct
-import datetime
 import decimal
-
-try:
-    # Python 2
-    from itertools import izip
-except ImportError:
-    # Python 3
-    izip = zip
-
-try:
-    xrange
-except NameError:
-    xrange = range
+import warnings
+import collections
 
 import pandas as pd
 import numpy as np
@@ -73,10 +64,121 @@ except:
     gpd = None
     fiona = None
 
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as pa_feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 from pymdwizard.core import utils
 
 
-def read_csv(fname, delimiter=","):
+CSVFormat = collections.namedtuple("CSVFormat", ["encoding", "delimiter"])
+
+SNIFF_DELIMITERS = ",\t|;:"
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def sniff_csv(fname, sample_size=65536, default_delimiter=","):
+    """
+    Guess the encoding and delimiter of a csv or txt file from the
+    first sample_size bytes.
+
+    The encoding is taken from a byte order mark if there is one,
+    otherwise it is utf-8 if the file is valid utf-8 (the rest of the
+    file is checked too, which is much faster than parsing it).
+    Otherwise it is Windows-1252 if the bytes that aren't utf-8 are valid
+    Windows-1252, the usual case for files saved from Excel, or it is
+    detected with charset_normalizer (when installed) or is ISO-8859-1
+    (which can decode anything).
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the csv or txt file
+    sample_size : int, optional
+            the number of bytes to read
+    default_delimiter : str, optional
+            returned as the delimiter if one of SNIFF_DELIMITERS can't be
+            identified, e.g. the file only has one column
+
+    Returns
+    -------
+    CSVFormat namedtuple of (encoding, delimiter)
+    """
+    with open(fname, "rb") as f:
+        sample = f.read(sample_size)
+        truncated = len(sample) == sample_size
+
+        encoding = None
+        for bom, bom_encoding in _BOMS:
+            if sample.startswith(bom):
+                encoding = bom_encoding
+                break
+
+        undecoded = sample
+        try:
+            if encoding is None:
+                encoding = "utf-8"
+                decoder = codecs.getincrementaldecoder(encoding)()
+                text = decoder.decode(sample, final=not truncated)
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    undecoded = block
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+            else:
+                decoder = codecs.getincrementaldecoder(encoding)()
+                text = decoder.decode(sample, final=not truncated)
+        except UnicodeDecodeError:
+            encoding = None
+
+    if encoding is None:
+        try:
+            undecoded.decode("cp1252")
+            encoding = "cp1252"
+        except UnicodeDecodeError:
+            encoding = "ISO-8859-1"
+            if charset_normalizer is not None:
+                match = charset_normalizer.from_bytes(undecoded).best()
+                if match is not None:
+                    encoding = match.encoding
+        text = sample.decode(encoding, errors="replace")
+
+    lines = text.splitlines()
+    if truncated:
+        lines = lines[:-1]  # the last line is probably incomplete
+    lines = [line for line in lines if line and not line.startswith("#")]
+    try:
+        dialect = csv.Sniffer().sniff(
+            "\n".join(lines[:100]), delimiters=SNIFF_DELIMITERS
+        )
+        delimiter = dialect.delimiter
+    except csv.Error:
+        delimiter = default_delimiter
+
+    return CSVFormat(encoding, delimiter)
+
+
+def read_csv(fname, delimiter=None, encoding=None, engine=None, columns=None):
     """
     converts a csv, specified by filename, into a pandas dataframe
 
@@ -84,49 +186,187 @@ def read_csv(fname, delimiter=","):
     ----------
     fname : string
             Full fname to the csv to return
-    delimiter : str, optional, defaults to comma
-            the character used to delimit the data in a txt file
+    delimiter : str, optional
+            the character used to delimit the data in a txt file,
+            if not specified it is detected with sniff_csv
+    encoding : str, optional
+            the encoding of the file,
+            if not specified it is detected with sniff_csv
+    engine : str, optional
+            'pyarrow' to parse the file with multiple threads using
+            pyarrow.csv (requires pyarrow), this also parses ISO 8601 dates.
+            Files pyarrow can't read, those with # comment lines, utf-16 or
+            utf-32 files and malformed files, fall back to pandas.
+    columns : list of str, optional
+            only read these columns
 
     Returns
     -------
     pandas dataframe
     """
+    if delimiter is None or encoding is None:
+        csv_format = sniff_csv(fname)
+        delimiter = delimiter or csv_format.delimiter
+        encoding = encoding or csv_format.encoding
 
     max_rows = int(utils.get_setting("maxrows", 1000000))
+    if engine == "pyarrow":
+        _require_pyarrow(fname)
+        ascii_compatible = not encoding.startswith(("utf-16", "utf-32"))
+        if ascii_compatible and not _has_comment_lines(fname):
+            try:
+                return _read_arrow_csv(fname, delimiter, encoding, columns, max_rows)
+            except pa.ArrowInvalid:
+                pass
+
     try:
         df = pd.read_csv(
             fname,
             parse_dates=True,
+            encoding=encoding,
             delimiter=delimiter,
             nrows=max_rows,
             na_filter=False,
             comment="#",
+            usecols=columns,
         )
     except UnicodeDecodeError:
-        try:
-            df = pd.read_csv(
-                fname,
-                parse_dates=True,
-                encoding="utf8",
-                delimiter=delimiter,
-                nrows=max_rows,
-                na_filter=False,
-                comment="#",
-            )
-        except UnicodeDecodeError:
-            df = pd.read_csv(
-                fname,
-                parse_dates=True,
-                encoding="ISO-8859-1",
-                delimiter=delimiter,
-                nrows=max_rows,
-                na_filter=False,
-                comment="#",
-            )
+        # an encoding that was passed in, or that charset_normalizer
+        # guessed from the sample, is wrong
+        df = pd.read_csv(
+            fname,
+            parse_dates=True,
+            encoding="ISO-8859-1",
+            delimiter=delimiter,
+            nrows=max_rows,
+            na_filter=False,
+            comment="#",
+            usecols=columns,
+        )
 
     return df
 
 
+def _has_comment_lines(fname):
+    """
+    True if a line in a (ascii compatible) text file starts with #
+    """
+    with open(fname, "rb") as f:
+        block = f.read(1 << 20)
+        if block.startswith(codecs.BOM_UTF8):
+            block = block[len(codecs.BOM_UTF8) :]
+        previous = b"\n"
+        while block:
+            if b"\n#" in block or (previous == b"\n" and block.startswith(b"#")):
+                return True
+            previous = block[-1:]
+            block = f.read(1 << 20)
+    return False
+
+
+def _require_pyarrow(fname):
+    if pa is None:
+        raise ImportError("pyarrow is required to read {}".format(fname))
+
+
+def _read_arrow_csv(fname, delimiter, encoding, columns, max_rows):
+    """
+    read_csv with pyarrow, the file is read in blocks (in parallel) until
+    max_rows rows have been read
+    """
+    if encoding == "utf-8-sig":
+        encoding = "utf8"  # pyarrow skips the byte order mark itself
+    reader = pa_csv.open_csv(
+        fname,
+        read_options=pa_csv.ReadOptions(use_threads=True, encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns or [],
+            strings_can_be_null=False,
+            null_values=[],
+        ),
+    )
+    batches = []
+    row_count = 0
+    for batch in reader:
+        batches.append(batch)
+        row_count += batch.num_rows
+        if row_count >= max_rows:
+            break
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    return table.slice(0, max_rows).to_pandas()
+
+
+def read_parquet(fname, columns=None, row_groups=None):
+    """
+    Returns a pandas dataframe of a Parquet file (requires pyarrow)
+
+    Only the column chunks of the requested columns in the requested
+    row groups are read from the file.
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the Parquet file
+    columns : list of str, optional
+            only read these columns
+    row_groups : int or list of int, optional
+            the indexes of the row groups to read, or the number of row
+            groups to sample evenly through the file.  If not specified
+            row groups are read from the start of the file until there
+            are maxrows rows
+
+    Returns
+    -------
+        pandas dataframe
+    """
+    _require_pyarrow(fname)
+    max_rows = int(utils.get_setting("maxrows", 1000000))
+
+    parquet = pq.ParquetFile(fname)
+    group_count = parquet.num_row_groups
+    if row_groups is None:
+        row_groups = []
+        row_count = 0
+        for index in range(group_count):
+            if row_count >= max_rows:
+                break
+            row_groups.append(index)
+            row_count += parquet.metadata.row_group(index).num_rows
+    elif isinstance(row_groups, int):
+        sample_count = min(row_groups, group_count)
+        row_groups = sorted(
+            set(np.linspace(0, group_count - 1, sample_count).round().astype(int))
+        )
+
+    table = parquet.read_row_groups(list(row_groups), columns=columns)
+    return table.slice(0, max_rows).to_pandas()
+
+
+def read_feather(fname, columns=None):
+    """
+    Returns a pandas dataframe of a Feather (Arrow IPC) file
+    (requires pyarrow).  The file is memory mapped, so uncompressed
+    columns that aren't requested are never read.
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the Feather file
+    columns : list of str, optional
+            only read these columns
+
+    Returns
+    -------
+        pandas dataframe
+    """
+    _require_pyarrow(fname)
+    max_rows = int(utils.get_setting("maxrows", 1000000))
+
+    table = pa_feather.read_table(fname, columns=columns, memory_map=True)
+    return table.slice(0, max_rows).to_pandas()
+
+
 def read_shp(fname):
     """
     Returns a pandas dataframe of the attribute in a shapefile's dbf
@@ -142,79 +382,163 @@ def read_shp(fname):
         pandas dataframe
     """
     df = gpd.read_file(fname)
-    c = fiona.open(fname)
-    list(c.schema["properties"].keys())
+    with fiona.open(fname) as c:
+        geometry_type = c.schema["geometry"]
+    return _shp_attributes(df, geometry_type)
+
 
+def _shp_attributes(df, geometry_type, start=0):
+    """
+    The attribute table of (some of the rows of) a shapefile read with
+    geopandas, with the geometry replaced by its type, see read_shp
+
+    Parameters
+    ----------
+    df : geopandas dataframe
+    geometry_type : str
+    start : int, optional
+            The index of the first row of df in the file
+
+    Returns
+    -------
+        pandas dataframe
+    """
     df = df[[c for c in df.columns if c != "geometry"]]
-    df.insert(0, "Shape", c.schema["geometry"])
+    df.insert(0, "Shape", geometry_type)
     if not "FID" in df.columns:
-        df.insert(0, "FID", range(df.shape[0]))
+        df.insert(0, "FID", range(start, start + df.shape[0]))
     return df
 
 
-def dbfreader(f):
-    """Returns an iterator over records in a Xbase DBF file.
-    The first row returned contains the field names.
-    The second row contains field specs: (type, size, decimal places).
-    Subsequent rows contain the data records.
-    If a record is marked as deleted, it is skipped.
-    File should be opened for binary reads.
+def _iter_shp_chunks(fname, chunksize):
+    """
+    Iterate over the attribute table of a shapefile, chunksize rows at a
+    time, only those rows are read for each chunk
+    """
+    with fiona.open(fname) as c:
+        geometry_type = c.schema["geometry"]
+        row_count = len(c)
+    for start in range(0, row_count, chunksize):
+        df = gpd.read_file(fname, rows=slice(start, start + chunksize))
+        yield _shp_attributes(df, geometry_type, start)
+
 
-    originally taken from:
-        http://code.activestate.com/recipes/362715-dbf-reader-and-writer/
+def _open_dbf(fname):
+    """
+    Memory map the records in an Xbase DBF file
 
     See DBF format spec at:
         http://www.pgts.com.au/download/public/xbase.htm#DBF_STRUCT
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the dbf
+
+    Returns
+    -------
+    tuple of (numpy memmap of records, list of field (name, type, size,
+    decimal places)).  The records have a 'DeletionFlag' field followed
+    by a bytes field for each field in the file.
+    """
+    with open(fname, "rb") as f:
+        numrec, lenheader, lenrecord = struct.unpack("<xxxxLHH20x", f.read(32))
+        fields = []
+        descriptor = f.read(32)
+        while descriptor[:1] not in (b"\r", b""):
+            name, typ, size, deci = struct.unpack("<11sc4xBB14x", descriptor)
+            name = name.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+            fields.append((name, typ.decode("ascii", errors="replace"), size, deci))
+            descriptor = f.read(32)
+        file_size = f.seek(0, 2)
+
+    names = ["DeletionFlag"]
+    formats = ["S1"]
+    offsets = [0]
+    offset = 1
+    for name, typ, size, deci in fields:
+        names.append(name)
+        formats.append("S{}".format(size))
+        offsets.append(offset)
+        offset += size
+    dtype = np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": max(lenrecord, offset),
+        }
+    )
+
+    numrec = min(numrec, max(file_size - lenheader, 0) // dtype.itemsize)
+    if not numrec:
+        return np.zeros(0, dtype=dtype), fields
+    records = np.memmap(fname, dtype=dtype, mode="r", offset=lenheader, shape=(numrec,))
+    return records, fields
+
+
+def _decode_dbf_field(values, typ, deci):
     """
+    Convert a numpy array of the raw bytes of a dbf field to the
+    appropriate type
 
-    numrec, lenheader = struct.unpack("<xxxxLH22x", f.read(32))
-    numfields = (lenheader - 33) // 32
-
-    fields = []
-    for fieldno in xrange(numfields):
-        name, typ, size, deci = struct.unpack("<11sc4xBB14x", f.read(32))
-        name = bytes(name)
-        name = name.replace(b"\0", b"")  #  eliminate NULs from string
-        fields.append((name, typ, size, deci))
-    yield [field[0] for field in fields]
-    yield [tuple(field[1:]) for field in fields]
-
-    terminator = f.read(1)
-    assert terminator == b"\r"
-
-    fields.insert(0, ("DeletionFlag", "C", 1, 0))
-    fmt = "".join(["%ds" % fieldinfo[2] for fieldinfo in fields])
-    fmtsiz = struct.calcsize(fmt)
-    for i in xrange(numrec):
-        record = struct.unpack(fmt, f.read(fmtsiz))
-        if record[0] != b" ":
-            continue  #  deleted record
-        result = []
-        for (name, typ, size, deci), value in izip(fields, record):
-            value = bytes(value)
-            if name == "DeletionFlag":
-                continue
-            if typ == b"N":
-                value = value.replace(b"\0", b"").lstrip()
-                if value == "":
-                    value = 0
-                elif deci:
-                    value = decimal.Decimal(value)
-                else:
-                    value = int(value)
-            if typ == b"C":
-                value = value.decode("utf-8")
-            elif typ == b"D":
-                y, m, d = int(value[:4]), int(value[4:6]), int(value[6:8])
-                value = datetime.date(y, m, d)
-            elif typ == b"L":
-                value = (
-                    (value in b"YyTt" and b"T") or (value in b"NnFf" and b"F") or b"?"
-                )
-            elif typ == b"F":
-                value = float(value)
-            result.append(value)
-        yield result
+    Parameters
+    ----------
+    values : numpy array of bytes
+    typ : str
+          dbf field type, 'C' character, 'N' numeric, 'F' float, 'D' date,
+          'L' logical, anything else is treated as character
+    deci : int
+          number of decimal places of a numeric field
+
+    Returns
+    -------
+    numpy array or pandas extension array
+    """
+    stripped = np.char.strip(values)
+    if typ in ("N", "F"):
+        blank = stripped == b""
+        try:
+            if deci or typ == "F" or blank.any():
+                return np.where(blank, b"nan", stripped).astype(np.float64)
+            return stripped.astype(np.int64)
+        except ValueError:
+            # e.g. a value too large for the field, written as '*****'
+            return pd.to_numeric(
+                pd.Series(stripped).str.decode("ISO-8859-1"), errors="coerce"
+            ).to_numpy()
+    elif typ == "D":
+        return pd.to_datetime(
+            pd.Series(stripped).str.decode("ISO-8859-1"),
+            format="%Y%m%d",
+            errors="coerce",
+        ).to_numpy()
+    elif typ == "L":
+        upper = np.char.upper(stripped)
+        logical = pd.array(np.isin(upper, [b"T", b"Y"]), dtype="boolean")
+        logical[~np.isin(upper, [b"T", b"Y", b"F", b"N"])] = pd.NA
+        return logical
+
+    try:
+        return stripped.astype("U")
+    except UnicodeDecodeError:
+        pass
+    try:
+        return np.char.decode(stripped, "utf-8")
+    except UnicodeDecodeError:
+        return np.char.decode(stripped, "ISO-8859-1")
+
+
+def _dbf_to_df(records, fields):
+    """
+    Returns a pandas dataframe of memory mapped dbf records,
+    records marked as deleted are skipped
+    """
+    keep = records["DeletionFlag"] == b" "
+    columns = collections.OrderedDict()
+    for name, typ, size, deci in fields:
+        columns[name] = _decode_dbf_field(records[name][keep], typ, deci)
+    return pd.DataFrame(columns, columns=[field[0] for field in fields])
 
 
 def read_dbf(fname):
@@ -222,6 +546,11 @@ def read_dbf(fname):
     Returns a pandas dataframe of the dbf
      specified as a file path/name
 
+    The file is memory mapped and each field is converted for all of
+    the records at once.  Character fields are stripped of padding,
+    numeric fields are int64 (float64 if they have decimal places or
+    blanks), dates are datetime64 and logical fields are nullable booleans.
+
     Parameters
     ----------
     fname : str
@@ -231,9 +560,8 @@ def read_dbf(fname):
     -------
         pandas dataframe
     """
-    f = open(fname, "rb")
-    vat = list(dbfreader(f))
-    return pd.DataFrame(vat[2:], columns=[c.decode("utf-8") for c in vat[0]])
+    records, fields = _open_dbf(fname)
+    return _dbf_to_df(records, fields)
 
 
 def get_sheet_names(fname):
@@ -274,6 +602,69 @@ def read_excel(fname, sheet_name):
     return df
 
 
+def _excel_columns(header):
+    """
+    The column names pandas gives an Excel header row, empty cells are
+    named 'Unnamed: i' and repeated names get a '.n' suffix
+    """
+    columns = []
+    seen = collections.Counter()
+    for i, name in enumerate(header):
+        if name is None:
+            name = "Unnamed: {}".format(i)
+        if seen[name]:
+            columns.append("{}.{}".format(name, seen[name]))
+        else:
+            columns.append(name)
+        seen[name] += 1
+    return columns
+
+
+def _iter_excel_chunks(fname, sheet_name, chunksize):
+    """
+    Iterate over a sheet of an Excel file, chunksize rows at a time.
+    xlsx and xlsm files are streamed with openpyxl in read only mode,
+    other Excel files are read whole and then split.
+    """
+    lower_fname = fname.lower()
+    if openpyxl is None or not lower_fname.endswith((".xlsx", ".xlsm")):
+        df = read_excel(fname, sheet_name)
+        for start in range(0, df.shape[0], chunksize):
+            yield df.iloc[start : start + chunksize]
+        return
+
+    workbook = openpyxl.load_workbook(fname, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, str):
+            sheet = workbook[sheet_name]
+        else:
+            sheet = workbook.worksheets[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _excel_columns(header)
+        width = len(columns)
+
+        chunk = []
+        empty_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                # like read_excel, keep empty rows unless they are at the end
+                empty_rows += 1
+                continue
+            chunk.extend([(None,) * width] * empty_rows)
+            empty_rows = 0
+            chunk.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            while len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk[:chunksize], columns=columns)
+                chunk = chunk[chunksize:]
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
 def read_las(fname):
     """
     Returns a pandas dataframe of the attribute in a las file
@@ -292,28 +683,33 @@ def read_las(fname):
     max_rows = int(utils.get_setting("maxrows", 1000000))
 
     las = laspy.open(fname)
-    dims = [dim.name for dim in las.header.point_format]
 
     for points in las.chunk_iterator(max_rows):
         break
 
+    return _las_points_to_df(points, las.header)
+
+
+def _las_points_to_df(points, header):
+    """
+    Returns a pandas dataframe of a chunk of las points, with the
+    scaling and offsets applied to the X, Y, Z dimensions
+    """
+    dims = [dim.name for dim in header.point_format]
     point_data = {dim: np.array(points[dim]) for dim in dims}
-    
+
     # Apply scaling and offsets to X, Y, Z dimensions
-    header = las.header
     point_data["X"] = point_data["X"] * header.x_scale + header.x_offset
     point_data["Y"] = point_data["Y"] * header.y_scale + header.y_offset
     point_data["Z"] = point_data["Z"] * header.z_scale + header.z_offset
 
-    
-    df = pd.DataFrame(point_data)
-
-    return df
+    return pd.DataFrame(point_data)
 
 
-def read_data(fname, sheet_name="", delimiter=","):
+def read_data(fname, sheet_name="", delimiter=None, columns=None, engine=None):
     """
-    Returns pandas dataframe from a file (csv, txt, Excel, or shp)
+    Returns pandas dataframe from a file (csv, txt, Excel, shp, las,
+    Parquet or Feather)
 
     Parameters
     ----------
@@ -322,16 +718,26 @@ def read_data(fname, sheet_name="", delimiter=","):
     sheet_name : str, optional
             sheet name
     delimiter : str, optional
-            the character used to delimit the data in a txt file
+            the character used to delimit the data in a txt file,
+            if not specified it is detected with sniff_csv
+    columns : list of str, optional
+            only read these columns from a csv, txt, Parquet or Feather file
+    engine : str, optional
+            'pyarrow' to read csv and txt files with pyarrow, see read_csv
 
     Returns
     -------
         pandas dataframe
     """
-    if fname.lower().endswith(".csv"):
-        return read_csv(fname)
-    elif fname.lower().endswith(".txt"):
-        return read_csv(fname, delimiter)
+    lower_fname = fname.lower()
+    if lower_fname.endswith(".csv"):
+        return read_csv(fname, engine=engine, columns=columns)
+    elif lower_fname.endswith(".txt"):
+        return read_csv(fname, delimiter, engine=engine, columns=columns)
+    elif lower_fname.endswith(".parquet") or lower_fname.endswith(".pq"):
+        return read_parquet(fname, columns)
+    elif lower_fname.endswith(".feather") or lower_fname.endswith(".arrow"):
+        return read_feather(fname, columns)
     elif fname.lower().endswith(".shp"):
         return read_shp(fname)
     elif fname.lower().endswith(".las") or fname.lower().endswith(".laz"):
@@ -340,6 +746,30 @@ def read_data(fname, sheet_name="", delimiter=","):
         return read_excel(fname, sheet_name)
 
 
+NODATA_VALUES = [
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+    -9999,
+    "-9999",
+    "",
+    "Nan",
+]
+
+
 def sniff_nodata(series):
     """
     Attempt to guess the nodata value associated with a series
@@ -354,28 +784,7 @@ def sniff_nodata(series):
     """
     uniques = series.uniques()
 
-    for nd in [
-        "#N/A",
-        "#N/A N/A",
-        "#NA",
-        "-1.#IND",
-        "-1.#QNAN",
-        "-NaN",
-        "-nan",
-        "1.#IND",
-        "1.#QNAN",
-        "N/A",
-        "NA",
-        "NULL",
-        "NaN",
-        "n/a",
-        "nan",
-        "null",
-        -9999,
-        "-9999",
-        "",
-        "Nan",
-    ]:
+    for nd in NODATA_VALUES:
         if nd in list(uniques):
             return nd
 
@@ -410,3 +819,835 @@ def clean_nodata(series, nodata=None):
             pass
 
     return clean_series
+
+
+def iter_chunks(
+    fname,
+    sheet_name="",
+    delimiter=None,
+    chunksize=100000,
+    encoding=None,
+    columns=None,
+):
+    """
+    Returns an iterator over a data file (csv, txt, Excel, las, dbf, shp,
+    Parquet or Feather) as pandas dataframes of at most chunksize rows.
+    Unlike read_data the whole file is read, the maxrows setting is not
+    applied.
+
+    CSV and txt files are read the same way as read_csv, so empty cells
+    are '' rather than null.
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the data file
+    sheet_name : str, optional
+            sheet name, used for Excel files
+    delimiter : str, optional
+            the character used to delimit the data in a csv or txt file,
+            if not specified it is detected with sniff_csv
+    chunksize : int, optional
+            the number of rows in each chunk
+    encoding : str, optional
+            the encoding of a csv or txt file,
+            if not specified it is detected with sniff_csv
+    columns : list of str, optional
+            only read these columns from a csv, txt, Parquet or Feather file
+
+    Returns
+    -------
+    generator of pandas dataframes
+
+    Raises
+    ------
+    ValueError if the type of file is not supported
+    """
+    lower_fname = fname.lower()
+    if lower_fname.endswith(".csv") or lower_fname.endswith(".txt"):
+        if delimiter is None or encoding is None:
+            csv_format = sniff_csv(fname)
+            delimiter = delimiter or csv_format.delimiter
+            encoding = encoding or csv_format.encoding
+        reader = pd.read_csv(
+            fname,
+            delimiter=delimiter,
+            na_filter=False,
+            comment="#",
+            encoding=encoding,
+            chunksize=chunksize,
+            usecols=columns,
+        )
+        with reader:
+            for chunk in reader:
+                yield chunk
+    elif lower_fname.endswith(".parquet") or lower_fname.endswith(".pq"):
+        _require_pyarrow(fname)
+        parquet = pq.ParquetFile(fname)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif lower_fname.endswith(".feather") or lower_fname.endswith(".arrow"):
+        _require_pyarrow(fname)
+        table = pa_feather.read_table(fname, columns=columns, memory_map=True)
+        for batch in table.to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+    elif lower_fname.endswith(".las") or lower_fname.endswith(".laz"):
+        import laspy
+
+        with laspy.open(fname) as las:
+            for points in las.chunk_iterator(chunksize):
+                yield _las_points_to_df(points, las.header)
+    elif lower_fname.endswith(".dbf"):
+        records, fields = _open_dbf(fname)
+        for start in range(0, len(records), chunksize):
+            yield _dbf_to_df(records[start : start + chunksize], fields)
+    elif lower_fname.endswith(".shp"):
+        for chunk in _iter_shp_chunks(fname, chunksize):
+            yield chunk
+    elif sheet_name or lower_fname.endswith((".xls", ".xlsx", ".xlsm")):
+        for chunk in _iter_excel_chunks(fname, sheet_name or 0, chunksize):
+            yield chunk
+    else:
+        raise ValueError("Unsupported data file type: {}".format(fname))
+
+
+def _bit_length(values):
+    """
+    The number of bits needed to represent each value in an array of uint64
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1])
+
+
+class HyperLogLog(object):
+    """
+    Approximate count of the distinct values added, in constant memory
+    (2**precision bytes).  The relative error is about
+    1.04 / sqrt(2**precision), 0.8% for the default precision of 14.
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """
+        Add values to the sketch
+
+        Parameters
+        ----------
+        values : array like
+
+        Returns
+        -------
+        None
+        """
+        hashes = pd.util.hash_array(np.asarray(values))
+        if not len(hashes):
+            return
+        value_bits = 64 - self.precision
+        index = (hashes >> np.uint64(value_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << value_bits) - 1)
+        rank = (value_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Add the values counted by another HyperLogLog of the same precision
+
+        Parameters
+        ----------
+        other : HyperLogLog
+
+        Returns
+        -------
+        None
+        """
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Returns the estimated number of distinct values added
+
+        Returns
+        -------
+        int
+        """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.ldexp(1.0, -self.registers.astype(int)).sum()
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * size and zeros:
+            # small range correction
+            estimate = size * np.log(size / zeros)
+        return int(round(estimate))
+
+
+def _scalar(value):
+    """
+    Convert a numpy scalar to the equivalent python value
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _value_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _text_keys(text, numbers):
+    """
+    The values of a text chunk in the form used to count distinct values:
+    text that is written the way a number is written (e.g. '1' or '2.5')
+    is replaced by that number, so that a value read as text in one chunk
+    and as a number in another is only counted once.
+
+    Parameters
+    ----------
+    text : pandas series
+            The values as str
+    numbers : pandas series
+            The values as numbers, nan if they are not numbers
+
+    Returns
+    -------
+    numpy array of str and float objects
+    """
+    keys = text.to_numpy(dtype=object)
+    for i in np.flatnonzero(numbers.notna().to_numpy()):
+        number = float(numbers.iat[i])
+        if _value_text(number) == keys[i]:
+            keys[i] = number
+    return keys
+
+
+def _datetime_keys(values):
+    """
+    The nanoseconds since the epoch (in UTC) of a datetime64 series, the
+    same time is the same key whatever the unit or time zone of its chunk
+    """
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+    return values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _datetime_range(values):
+    """
+    The first and last value of a datetime64 series as ISO 8601 text
+    """
+    return values.min().isoformat(), values.max().isoformat()
+
+
+class ColumnProfile(object):
+    """
+    Bounded memory summary of a column that is updated one chunk at a time,
+    see profile_data.
+
+    Nulls and nodata values (see NODATA_VALUES) are counted and are not
+    included in the range or the distinct values.
+    If every other value is a number min and max are numbers, otherwise
+    they are the first and last value sorted as text (numbers in chunks
+    that were read as a numeric column only contribute that chunk's
+    min and max to this).  Dates and times are not numbers, their range
+    is the first and last in ISO 8601 text (e.g. 2020-01-01T00:00:00).
+    Up to max_distinct distinct values are kept, after that only the
+    HyperLogLog estimate is available.
+    """
+
+    def __init__(self, name, max_distinct=1000, nodata=NODATA_VALUES):
+        self.name = name
+        self.max_distinct = max_distinct
+        self.nodata = list(nodata)
+        self.count = 0
+        self.null_count = 0
+        self.nodata_counts = collections.OrderedDict()
+        self.numeric = True
+        self.distinct = set()
+        self._distinct_keys = set()
+        self.distinct_overflow = False
+        self.hll = HyperLogLog()
+        self._number_range = None
+        self._text_range = None
+
+    def update(self, series):
+        """
+        Add the values in a chunk of this column
+
+        Parameters
+        ----------
+        series : pandas series
+
+        Returns
+        -------
+        None
+        """
+        self.count += len(series)
+        self.null_count += int(series.isna().sum())
+
+        # everything else only needs to look at each value once
+        uniques = pd.Series(series.unique(), dtype=series.dtype)
+        uniques = uniques[uniques.notna()]
+        nodata = uniques.isin(self.nodata)
+        if nodata.any():
+            counts = series[series.isin(uniques[nodata])].value_counts()
+            for value, count in counts.items():
+                value = _scalar(value)
+                self.nodata_counts[value] = self.nodata_counts.get(value, 0) + int(count)
+            uniques = uniques[~nodata]
+
+        if not len(uniques):
+            return
+
+        if pd.api.types.is_datetime64_any_dtype(uniques.dtype):
+            # the epoch numbers of dates are no use as a range
+            self.numeric = False
+            numbers = uniques.iloc[:0]
+            self._update_text_range(*_datetime_range(uniques))
+            keys = _datetime_keys(uniques)
+            self.hll.add(keys)
+        elif pd.api.types.is_numeric_dtype(uniques.dtype):
+            numbers = uniques
+            self._update_text_range(str(uniques.min()), str(uniques.max()))
+            keys = uniques.to_numpy()
+            self.hll.add(keys.astype(np.float64))
+        else:
+            parsed = pd.to_numeric(uniques, errors="coerce")
+            numbers = parsed
+            if numbers.isna().any():
+                self.numeric = False
+                numbers = numbers.dropna()
+            text = uniques.astype(str)
+            self._update_text_range(text.min(), text.max())
+            keys = _text_keys(text, parsed)
+            is_text = np.array([isinstance(key, str) for key in keys], dtype=bool)
+            self.hll.add(keys[~is_text].astype(np.float64))
+            self.hll.add(keys[is_text])
+        if len(numbers):
+            self._update_number_range(_scalar(numbers.min()), _scalar(numbers.max()))
+
+        if not self.distinct_overflow:
+            for value, key in zip(uniques, keys):
+                key = _scalar(key)
+                if key in self._distinct_keys:
+                    continue
+                if len(self.distinct) == self.max_distinct:
+                    self.distinct_overflow = True
+                    self._distinct_keys = None
+                    break
+                self._distinct_keys.add(key)
+                self.distinct.add(_scalar(value))
+
+    def _update_number_range(self, low, high):
+        if self._number_range is not None:
+            low = min(low, self._number_range[0])
+            high = max(high, self._number_range[1])
+        self._number_range = (low, high)
+
+    def _update_text_range(self, low, high):
+        if self._text_range is not None:
+            low = min(low, self._text_range[0])
+            high = max(high, self._text_range[1])
+        self._text_range = (low, high)
+
+    @property
+    def min(self):
+        value_range = self._number_range if self.numeric else self._text_range
+        return None if value_range is None else value_range[0]
+
+    @property
+    def max(self):
+        value_range = self._number_range if self.numeric else self._text_range
+        return None if value_range is None else value_range[1]
+
+    @property
+    def distinct_count(self):
+        """
+        The exact number of distinct values, None if there were more than
+        max_distinct
+        """
+        return None if self.distinct_overflow else len(self.distinct)
+
+    @property
+    def approx_distinct(self):
+        """
+        The HyperLogLog estimate of the number of distinct values,
+        None if it is not known
+        """
+        return None if self.hll is None else self.hll.count()
+
+    def to_dict(self):
+        """
+        Returns the summary as a dictionary
+
+        Returns
+        -------
+        OrderedDict
+        """
+        return collections.OrderedDict(
+            [
+                ("name", self.name),
+                ("count", self.count),
+                ("null_count", self.null_count),
+                ("nodata_counts", dict(self.nodata_counts)),
+                ("numeric", self.numeric and self._number_range is not None),
+                ("min", self.min),
+                ("max", self.max),
+                ("distinct_count", self.distinct_count),
+                ("approx_distinct", self.approx_distinct),
+            ]
+        )
+
+
+def profile_data(
+    fname,
+    sheet_name="",
+    delimiter=None,
+    chunksize=100000,
+    max_distinct=1000,
+    as_dataframe=False,
+    columns=None,
+    metadata_only=False,
+):
+    """
+    Summarize every column in a data file (csv, txt, Excel, las, dbf, shp,
+    Parquet or Feather) without loading it all into memory,
+    see ColumnProfile.
+    Unlike read_data the whole file is used, the maxrows setting is
+    not applied.
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the data file
+    sheet_name : str, optional
+            sheet name, used for Excel files
+    delimiter : str, optional
+            the character used to delimit the data in a csv or txt file,
+            if not specified it is detected with sniff_csv
+    chunksize : int, optional
+            the number of rows read at a time
+    max_distinct : int, optional
+            the maximum number of distinct values kept for each column
+    as_dataframe : bool, optional
+            used to specify return format (OrderedDict or dataframe)
+    columns : list of str, optional
+            only profile these columns, only these columns are read from
+            a csv, txt, Parquet or Feather file
+    metadata_only : bool, optional
+            If True, Parquet files are profiled from their metadata,
+            see profile_parquet_metadata.  Ignored for other files.
+
+    Returns
+    -------
+        OrderedDict of column name: ColumnProfile
+        or
+        pandas dataframe with a row for each column
+    """
+    lower_fname = fname.lower()
+    is_parquet = lower_fname.endswith(".parquet") or lower_fname.endswith(".pq")
+    if metadata_only and is_parquet:
+        profiles = profile_parquet_metadata(fname, columns, max_distinct)
+        encodings = []
+    elif lower_fname.endswith(".csv") or lower_fname.endswith(".txt"):
+        # retry a text file with ISO-8859-1 if the detected encoding is wrong
+        encodings = [None, "ISO-8859-1"]
+    else:
+        encodings = [None]
+    for encoding in encodings:
+        profiles = collections.OrderedDict()
+        try:
+            for chunk in iter_chunks(
+                fname, sheet_name, delimiter, chunksize, encoding, columns
+            ):
+                for column in columns or chunk.columns:
+                    if column not in profiles:
+                        profiles[column] = ColumnProfile(column, max_distinct)
+                    profiles[column].update(chunk[column])
+            break
+        except UnicodeDecodeError:
+            # a guessed encoding is wrong
+            if encoding == encodings[-1]:
+                raise
+
+    if as_dataframe:
+        return pd.DataFrame([profile.to_dict() for profile in profiles.values()])
+    return profiles
+
+
+_PARQUET_DTYPES = {
+    "INT32": "<i4",
+    "INT64": "<i8",
+    "FLOAT": "<f4",
+    "DOUBLE": "<f8",
+}
+
+# parquet PageHeader.type and Encoding values
+_DATA_PAGE, _DICTIONARY_PAGE, _DATA_PAGE_V2 = 0, 2, 3
+_DICTIONARY_ENCODINGS = (2, 8)  # PLAIN_DICTIONARY, RLE_DICTIONARY
+
+# ColumnChunkMetaData.compression: pyarrow codec name
+_PARQUET_CODECS = {
+    "SNAPPY": "snappy",
+    "GZIP": "gzip",
+    "BROTLI": "brotli",
+    "ZSTD": "zstd",
+    "LZ4_RAW": "lz4_raw",
+}
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_zigzag(buf, pos):
+    value, pos = _read_varint(buf, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _read_thrift_value(buf, pos, value_type):
+    """
+    Read one value of a thrift compact protocol type, structs are returned
+    as a dictionary of field id: value
+    """
+    if value_type in (1, 2):
+        return value_type == 1, pos
+    elif value_type == 3:
+        return buf[pos], pos + 1
+    elif value_type in (4, 5, 6):
+        return _read_zigzag(buf, pos)
+    elif value_type == 7:
+        return struct.unpack_from("<d", buf, pos)[0], pos + 8
+    elif value_type == 8:
+        size, pos = _read_varint(buf, pos)
+        return bytes(buf[pos : pos + size]), pos + size
+    elif value_type in (9, 10):
+        size, item_type = buf[pos] >> 4, buf[pos] & 0x0F
+        pos += 1
+        if size == 15:
+            size, pos = _read_varint(buf, pos)
+        items = []
+        for i in range(size):
+            if item_type in (1, 2):
+                item, pos = buf[pos] == 1, pos + 1
+            else:
+                item, pos = _read_thrift_value(buf, pos, item_type)
+            items.append(item)
+        return items, pos
+    elif value_type == 11:
+        size, pos = _read_varint(buf, pos)
+        items = {}
+        if size:
+            key_type, item_type = buf[pos] >> 4, buf[pos] & 0x0F
+            pos += 1
+            for i in range(size):
+                key, pos = _read_thrift_value(buf, pos, key_type)
+                items[key], pos = _read_thrift_value(buf, pos, item_type)
+        return items, pos
+    elif value_type == 12:
+        return _read_thrift_struct(buf, pos)
+    raise ValueError("Unknown thrift type {}".format(value_type))
+
+
+def _read_thrift_struct(buf, pos=0):
+    """
+    Read a thrift compact protocol struct (e.g. a parquet PageHeader)
+
+    Returns
+    -------
+    tuple of (dictionary of field id: value, position after the struct)
+    """
+    fields = {}
+    field_id = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        if byte == 0:
+            return fields, pos
+        delta, field_type = byte >> 4, byte & 0x0F
+        if delta:
+            field_id += delta
+        else:
+            field_id, pos = _read_zigzag(buf, pos)
+        fields[field_id], pos = _read_thrift_value(buf, pos, field_type)
+
+
+def _read_page_header(f, offset):
+    """
+    Returns the PageHeader at an offset in a parquet file and its length
+    """
+    size = 256
+    while True:
+        f.seek(offset)
+        buf = f.read(size)
+        try:
+            header, length = _read_thrift_struct(buf)
+            return header, length
+        except IndexError:
+            if len(buf) < size:
+                raise
+            size *= 4
+
+
+def _decompress_page(page, size, compression):
+    """
+    Decompress a parquet page, size is its uncompressed size
+    """
+    if compression == "UNCOMPRESSED":
+        return page
+    elif compression == "LZ4":
+        return _decompress_hadoop_lz4(page, size)
+    elif compression not in _PARQUET_CODECS:
+        raise ValueError("Unsupported Parquet compression {}".format(compression))
+    return pa.decompress(
+        page, decompressed_size=size, codec=_PARQUET_CODECS[compression]
+    ).to_pybytes()
+
+
+def _decompress_hadoop_lz4(page, size):
+    """
+    Decompress a page with the (deprecated) LZ4 codec, which is LZ4 blocks
+    each preceded by its big endian decompressed and compressed size.
+    Some writers used raw LZ4 blocks instead, those are read if the page
+    doesn't have this framing.
+    """
+    blocks = []
+    pos = 0
+    try:
+        while pos + 8 <= len(page):
+            block_size, compressed_size = struct.unpack_from(">II", page, pos)
+            pos += 8
+            if block_size > size or pos + compressed_size > len(page):
+                break
+            block = page[pos : pos + compressed_size]
+            blocks.append(
+                pa.decompress(
+                    block, decompressed_size=block_size, codec="lz4_raw"
+                ).to_pybytes()
+            )
+            pos += compressed_size
+    except (OSError, pa.ArrowException):
+        pass
+    else:
+        result = b"".join(blocks)
+        if pos == len(page) and len(result) == size:
+            return result
+    return pa.decompress(page, decompressed_size=size, codec="lz4_raw").to_pybytes()
+
+
+def _read_parquet_dictionary(f, column, arrow_type, max_values, type_length=None):
+    """
+    Returns the values in the dictionary page of a column chunk as an
+    array of arrow_type, None if the chunk has no dictionary, the
+    dictionary has more than max_values values, its values can't be
+    decoded here (e.g. INT96 timestamps), or any of its data pages aren't
+    dictionary encoded (so the dictionary doesn't have every value).
+    Raises an exception if the pages can't be read.
+    """
+    physical_type = column.physical_type
+    if not column.has_dictionary_page:
+        return None
+    elif physical_type == "FIXED_LEN_BYTE_ARRAY":
+        if not pa.types.is_decimal(arrow_type):
+            return None
+    elif physical_type not in list(_PARQUET_DTYPES) + ["BYTE_ARRAY"]:
+        return None
+
+    offset = column.dictionary_page_offset or column.data_page_offset
+    end = offset + column.total_compressed_size
+    values = None
+    while offset < end:
+        header, length = _read_page_header(f, offset)
+        offset += length
+        page_type, page_size = header[1], header[3]
+        if page_type == _DICTIONARY_PAGE:
+            if header[7][1] > max_values:
+                return None
+            f.seek(offset)
+            page = _decompress_page(f.read(page_size), header[2], column.compression)
+            values = _decode_plain(page, header[7][1], physical_type, type_length)
+        elif page_type == _DATA_PAGE and header[5][2] not in _DICTIONARY_ENCODINGS:
+            return None
+        elif page_type == _DATA_PAGE_V2 and header[8][4] not in _DICTIONARY_ENCODINGS:
+            return None
+        offset += page_size
+
+    if values is None:
+        return None
+    return _logical_values(values, arrow_type)
+
+
+def _decode_plain(page, count, physical_type, type_length=None):
+    """
+    Decode count PLAIN encoded values, returns a pyarrow array
+    """
+    if physical_type in _PARQUET_DTYPES:
+        return pa.array(np.frombuffer(page, _PARQUET_DTYPES[physical_type], count))
+    elif physical_type == "FIXED_LEN_BYTE_ARRAY":
+        values = [
+            page[i * type_length : (i + 1) * type_length] for i in range(count)
+        ]
+        return pa.array(values, pa.binary(type_length))
+
+    values = []
+    pos = 0
+    for i in range(count):
+        size = struct.unpack_from("<I", page, pos)[0]
+        values.append(page[pos + 4 : pos + 4 + size])
+        pos += 4 + size
+    return pa.array(values, pa.binary())
+
+
+def _logical_values(values, arrow_type):
+    """
+    Convert an array of physical values to arrow_type, decimals are
+    stored as the unscaled integer (big endian two's complement when
+    they're binary) so can't simply be cast.
+    """
+    if not pa.types.is_decimal(arrow_type):
+        return values.cast(arrow_type)
+    if pa.types.is_integer(values.type):
+        unscaled = values.to_pylist()
+    else:
+        unscaled = [
+            int.from_bytes(value, "big", signed=True) for value in values.to_pylist()
+        ]
+    return pa.array(
+        [decimal.Decimal(value).scaleb(-arrow_type.scale) for value in unscaled],
+        arrow_type,
+    )
+
+
+def profile_parquet_metadata(fname, columns=None, max_distinct=1000):
+    """
+    Profile the columns in a Parquet file without reading the data,
+    see profile_data and ColumnProfile.
+
+    The counts and range come from the statistics in the footer of each
+    row group.  If every row group of a column is dictionary encoded, and
+    there are no more than max_distinct distinct values, the dictionary
+    pages give the distinct values, which also makes the range exact when
+    it would otherwise include a nodata value.  Otherwise distinct,
+    distinct_count and approx_distinct are None, and the range includes
+    any nodata value that is the minimum or maximum.  Writers can store
+    truncated statistics for text and binary columns, values that might
+    not be in the data, so without the dictionary these columns have no
+    range (min and max are None).
+    Values are converted the same way as when the data is read, so e.g.
+    decimal columns are numeric and timestamp columns are text.
+    The number of each nodata value isn't known, so nodata_counts only
+    records which are present (with a count of None).
+    A warning is given if a dictionary page can't be read.
+
+    Parameters
+    ----------
+    fname : str
+            file path/name to the Parquet file
+    columns : list of str, optional
+            only profile these columns
+    max_distinct : int, optional
+            the maximum number of distinct values kept for each column
+
+    Returns
+    -------
+        OrderedDict of column name: ColumnProfile
+    """
+    _require_pyarrow(fname)
+    parquet = pq.ParquetFile(fname)
+    metadata = parquet.metadata
+    schema = parquet.schema_arrow
+
+    profiles = collections.OrderedDict()
+    with open(fname, "rb") as f:
+        for index in range(metadata.num_columns):
+            schema_column = metadata.schema.column(index)
+            name = schema_column.path
+            if columns is not None and name not in columns:
+                continue
+            arrow_type = schema.field(name).type
+            if pa.types.is_dictionary(arrow_type):
+                arrow_type = arrow_type.value_type
+
+            null_count = 0
+            low = high = None
+            dictionary = set()
+            for group in range(metadata.num_row_groups):
+                column = metadata.row_group(group).column(index)
+                stats = column.statistics
+                if null_count is not None and stats is not None and stats.has_null_count:
+                    null_count += stats.null_count
+                else:
+                    null_count = None
+                if stats is not None and stats.has_min_max:
+                    low = stats.min if low is None else min(low, stats.min)
+                    high = stats.max if high is None else max(high, stats.max)
+
+                if dictionary is not None:
+                    try:
+                        values = _read_parquet_dictionary(
+                            f, column, arrow_type, max_distinct, schema_column.length
+                        )
+                    except (
+                        ValueError,
+                        IndexError,
+                        struct.error,
+                        OSError,
+                        pa.ArrowException,
+                    ) as e:
+                        warnings.warn(
+                            "Could not read the {} dictionary in {}, "
+                            "using the statistics: {}".format(name, fname, e)
+                        )
+                        values = None
+                    if values is None:
+                        dictionary = None
+                    else:
+                        dictionary.update(values.to_pylist())
+                        if len(dictionary) > max_distinct:
+                            dictionary = None
+
+            profile = ColumnProfile(name, max_distinct)
+            if dictionary is not None:
+                dictionary.discard(None)
+                profile.update(pa.array(list(dictionary), arrow_type).to_pandas())
+            else:
+                profile.hll = None
+                profile.distinct = profile._distinct_keys = None
+                profile.distinct_overflow = True
+                truncated = schema_column.physical_type in (
+                    "BYTE_ARRAY",
+                    "FIXED_LEN_BYTE_ARRAY",
+                ) and not pa.types.is_decimal(arrow_type)
+                if low is not None and not truncated:
+                    # the same conversion as reading the data, see iter_chunks
+                    bounds = pa.array([low, high], arrow_type).to_pandas()
+                    for value in bounds:
+                        if value in profile.nodata:
+                            profile.nodata_counts[_scalar(value)] = None
+                    if pd.api.types.is_datetime64_any_dtype(bounds.dtype):
+                        profile.numeric = False
+                        profile._update_text_range(*_datetime_range(bounds))
+                    else:
+                        numbers = pd.to_numeric(bounds, errors="coerce")
+                        profile.numeric = not numbers.isna().any()
+                        if profile.numeric:
+                            profile._update_number_range(
+                                _scalar(numbers.min()), _scalar(numbers.max())
+                            )
+                        text = bounds.astype(str)
+                        profile._update_text_range(text.min(), text.max())
+            profile.count = metadata.num_rows
+            profile.null_count = null_count
+            profile.nodata_counts = collections.OrderedDict(
+                (value, None) for value in profile.nodata_counts
+            )
+            profiles[name] = profile
+    return profiles
@@ -47,7 +47,10 @@ the copyright owner.
 ------------------------------------------------------------------------------
 """
 
+import os
 import json
+import threading
+from types import MappingProxyType
 from dateutil import parser
 
 import defusedxml.lxml as lxml
@@ -58,12 +61,19 @@ from pymdwizard.core import xml_utils
 from pymdwizard.core import utils
 
 from collections import OrderedDict
+from collections.abc import Mapping
 
 FGDC_XSD_NAME = "FGDC/fgdc-std-001-1998-annotated.xsd"
 BDP_XSD_NAME = "FGDC/BDPfgdc-std-001-1998-annotated.xsd"
 
+# Compiled schemas are cached per thread, lxml's XMLSchema objects keep their
+# error_log on the instance so a single object can not safely be shared
+# between threads that are validating at the same time.
+_SCHEMA_CACHE = threading.local()
+_SCHEMA_GENERATION = 0
 
-def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False):
+
+def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False, reparse=True):
     """
 
     Parameters
@@ -85,6 +95,15 @@ def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False):
                 if not specified defaults to 'fgdc'
     as_dataframe : bool
                 used to specify return format (list of tuples or dataframe)
+    reparse : bool
+                If True (the default) the document is serialized and parsed
+                again before validating, so that the reported line numbers
+                refer to the pretty printed version of the document.
+                If False the document is validated in place.  Line numbers
+                are then those of the file or string it was parsed from,
+                which is fine for documents loaded from disk, but elements
+                built or inserted in memory have no source line.
+                A reparse is only needed to get line numbers for those.
 
     Returns
     -------
@@ -94,19 +113,16 @@ def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False):
         pandas dataframe
     """
 
-    if xsl_fname.lower() == "fgdc":
-        xsl_fname = utils.get_resource_path(FGDC_XSD_NAME)
-    elif xsl_fname.lower() == "bdp":
-        xsl_fname = utils.get_resource_path(BDP_XSD_NAME)
-    else:
-        xsl_fname = xsl_fname
-
-    xmlschema = xml_utils.load_schema(xsl_fname)
+    xmlschema = get_schema(xsl_fname)
     xml_doc = xml_utils.xml_document_loader(xml)
-    xml_str = xml_utils.node_to_string(xml_doc)
 
-    tree_node = xml_utils.string_to_node(xml_str.encode("utf-8"))
-    lxml._etree._ElementTree(tree_node)
+    if reparse:
+        xml_str = xml_utils.node_to_string(xml_doc)
+        tree_node = xml_utils.string_to_node(xml_str.encode("utf-8"))
+    elif isinstance(xml_doc, lxml._etree._ElementTree):
+        tree_node = xml_doc.getroot()
+    else:
+        tree_node = xml_doc
 
     errors = []
     srcciteas = []
@@ -183,23 +199,22 @@ def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False):
     if xmlschema.validate(tree_node) and not errors:
         return []
 
-    line_lookup = dict(
-        [
-            (e.sourceline, tree_node.getroottree().getpath(e))
-            for e in tree_node.xpath(".//*")
-        ]
+    error_log = xmlschema.error_log
+    line_lookup = _get_line_lookup(
+        tree_node, [error.line for error in error_log if not error.path]
     )
-    sourceline = tree_node.sourceline
-    line_lookup[sourceline] = tree_node.getroottree().getpath(tree_node)
 
     fgdc_lookup = get_fgdc_lookup()
 
-    for error in xmlschema.error_log:
+    for error in error_log:
         error_msg = clean_error_message(error.message, fgdc_lookup)
-        try:
-            errors.append((line_lookup[error.line][1:], error_msg, error.line))
-        except KeyError:
-            errors.append(("Unknown", error_msg, error.line))
+        if error.path:
+            errors.append((error.path[1:], error_msg, error.line))
+        else:
+            try:
+                errors.append((line_lookup[error.line][1:], error_msg, error.line))
+            except KeyError:
+                errors.append(("Unknown", error_msg, error.line))
 
     errors = list(OrderedDict.fromkeys(errors))
 
@@ -210,23 +225,234 @@ def validate_xml(xml, xsl_fname="fgdc", as_dataframe=False):
         return errors
 
 
-def get_fgdc_lookup():
+def _get_line_lookup(tree_node, lines):
+    """
+    Build a lookup of source line number to xpath, only for the lines given.
+    Used for schema errors that libxml2 did not report a node path for.
+
+    Parameters
+    ----------
+    tree_node : lxml element
+                The root element of the document that was validated
+    lines : list of int
+            The line numbers we need an xpath for
+
+    Returns
+    -------
+        dict : line number -> xpath of the last element starting on that line
+    """
+    lines = set(lines)
+    if not lines:
+        return {}
+
+    roottree = tree_node.getroottree()
+    line_lookup = {}
+    for e in tree_node.iterdescendants("*"):
+        if e.sourceline in lines:
+            line_lookup[e.sourceline] = roottree.getpath(e)
+    if tree_node.sourceline in lines:
+        line_lookup[tree_node.sourceline] = roottree.getpath(tree_node)
+
+    return line_lookup
+
+
+def get_schema_fname(xsl_fname="fgdc"):
+    """
+    Resolve a schema name into the full path of the xsd to use
+
+    Parameters
+    ----------
+    xsl_fname : str (optional)
+                can be one of:
+                'fgdc' - uses the standard fgdc schema
+                        ../resources/FGDC/fgdc-std-001-1998-annotated.xsd
+                'bdp' = use the Biological Data profile schema,
+                        ../resources/FGDC/BDPfgdc-std-001-1998-annotated.xsd
+                full file path to another local schema.
+
+    Returns
+    -------
+        str : absolute file path to the schema
+    """
+    if xsl_fname.lower() == "fgdc":
+        xsl_fname = utils.get_resource_path(FGDC_XSD_NAME)
+    elif xsl_fname.lower() == "bdp":
+        xsl_fname = utils.get_resource_path(BDP_XSD_NAME)
+
+    return os.path.abspath(xsl_fname)
+
+
+def get_schema(xsl_fname="fgdc"):
     """
-    Loads the local resource, 'bdp_lookup' into a json object
+    Returns a compiled lxml XMLSchema, compiling the xsd only the first time
+    it is requested.
+
+    Schemas are keyed by their path and modification time, so an xsd that
+    is edited on disk is recompiled the next time it is requested.
+    Each thread receives its own compiled instance.
+
+    Parameters
+    ----------
+    xsl_fname : str (optional)
+                'fgdc', 'bdp' or the full file path to another local schema.
+                See get_schema_fname
 
     Returns
     -------
-        json fgdc item lookup
+        lxml XMLSchema
     """
-    annotation_lookup_fname = utils.get_resource_path("FGDC/bdp_lookup")
+    fname = get_schema_fname(xsl_fname)
+    key = (fname, os.path.getmtime(fname))
+
+    if getattr(_SCHEMA_CACHE, "generation", None) != _SCHEMA_GENERATION:
+        _SCHEMA_CACHE.schemas = {}
+        _SCHEMA_CACHE.generation = _SCHEMA_GENERATION
+    schemas = _SCHEMA_CACHE.schemas
+
     try:
-        with open(annotation_lookup_fname, encoding="utf-8") as data_file:
-            annotation_lookup = json.loads(data_file.read())
-    except TypeError:
-        with open(annotation_lookup_fname) as data_file:
-            annotation_lookup = json.loads(data_file.read())
+        return schemas[key]
+    except KeyError:
+        for stale_key in [k for k in schemas if k[0] == fname]:
+            del schemas[stale_key]
+        xmlschema = xml_utils.load_schema(fname)
+        schemas[key] = xmlschema
+        return xmlschema
+
+
+def warm_schema_cache(schemas=("fgdc", "bdp")):
+    """
+    Compile the listed schemas up front so that the first call to
+    validate_xml does not pay the compilation cost.
+
+    Because compiled schemas are cached per thread this should be called
+    from the thread (or process) that will be doing the validating.
 
-    return annotation_lookup
+    Parameters
+    ----------
+    schemas : list of str (optional)
+              The schemas to compile, each can be 'fgdc', 'bdp' or
+              the full file path to another local schema.
+
+    Returns
+    -------
+        None
+    """
+    for xsl_fname in schemas:
+        get_schema(xsl_fname)
+
+
+def clear_schema_cache():
+    """
+    Discard all compiled schemas, in every thread.
+    They will be recompiled the next time they are requested.
+
+    Returns
+    -------
+        None
+    """
+    global _SCHEMA_GENERATION
+    _SCHEMA_GENERATION += 1
+
+
+class FGDCLookup(Mapping):
+    """
+    Read only lookup of the long name and annotation of each FGDC element,
+    keyed on the element's shortname.
+
+    The contents of the local resource, 'bdp_lookup', are not loaded until
+    the first time they are needed.
+    """
+
+    def __init__(self, fname=None):
+        """
+        Parameters
+        ----------
+        fname : str, optional
+                file path/name of the json lookup to use,
+                defaults to the 'FGDC/bdp_lookup' resource
+        """
+        self.fname = fname
+        self._lookup = None
+        self._lock = threading.Lock()
+
+    @property
+    def lookup(self):
+        if self._lookup is None:
+            with self._lock:
+                if self._lookup is None:
+                    fname = self.fname
+                    if fname is None:
+                        fname = utils.get_resource_path("FGDC/bdp_lookup")
+                    with open(fname, encoding="utf-8") as data_file:
+                        self._lookup = json.loads(data_file.read())
+        return self._lookup
+
+    def __getitem__(self, shortname):
+        return MappingProxyType(self.lookup[shortname])
+
+    def __contains__(self, shortname):
+        return shortname in self.lookup
+
+    def __iter__(self):
+        return iter(self.lookup)
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def long_name(self, shortname, default=None):
+        """
+        Returns the long name of an FGDC element
+
+        Parameters
+        ----------
+        shortname : str
+                    The element's tag, e.g. 'cntper'
+        default : optional
+                    Returned if the shortname is not in the lookup
+
+        Returns
+        -------
+            str
+        """
+        try:
+            return self.lookup[shortname]["long_name"]
+        except KeyError:
+            return default
+
+    def annotation(self, shortname, default=None):
+        """
+        Returns the annotation (help text) of an FGDC element
+
+        Parameters
+        ----------
+        shortname : str
+                    The element's tag, e.g. 'cntper'
+        default : optional
+                    Returned if the shortname is not in the lookup
+
+        Returns
+        -------
+            str
+        """
+        try:
+            return self.lookup[shortname]["annotation"]
+        except KeyError:
+            return default
+
+
+_FGDC_LOOKUP = FGDCLookup()
+
+
+def get_fgdc_lookup():
+    """
+    Returns the shared, read only, lookup of the local resource 'bdp_lookup'
+    It is only loaded from disk once per process.
+
+    Returns
+    -------
+        FGDCLookup fgdc item lookup
+    """
+    return _FGDC_LOOKUP
 
 
 def clean_error_message(message, fgdc_lookup=None):
@@ -66,12 +66,7 @@ FGDC_LOOKUP = fgdc_utils.get_fgdc_lookup()
 
 
 def _get_longname(tag):
-    try:
-        long_name = FGDC_LOOKUP[tag]["long_name"]
-    except KeyError:
-        long_name = tag
-
-    return long_name
+    return FGDC_LOOKUP.long_name(tag, tag)
 
 
 def _load_styles(doc):
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+The MetadataWizard(pymdwizard) software was developed by the
+U.S. Geological Survey Fort Collins Science Center.
+See: https://github.com/usgs/fort-pymdwizard for current project source code
+See: https://usgs.github.io/fort-pymdwizard/ for current user documentation
+See: https://github.com/usgs/fort-pymdwizard/tree/master/examples
+    for examples of use in other scripts
+
+License:            Creative Commons Attribution 4.0 International (CC BY 4.0)
+                    http://creativecommons.org/licenses/by/4.0/
+
+PURPOSE
+------------------------------------------------------------------------------
+Full-text search over directories of CSDGM (FGDC) XML records.
+Chosen fields of each record are stored in a local SQLite FTS5 database,
+only files that have changed since the last update are read again.
+
+
+SCRIPT DEPENDENCIES
+------------------------------------------------------------------------------
+    This script is part of the pymdwizard package and is not intented to be
+    used independently.  All pymdwizard package requirements are needed.
+    
+    See imports section for external packages used in this script as well as
+    inter-package dependencies
+
+
+U.S. GEOLOGICAL SURVEY DISCLAIMER
+------------------------------------------------------------------------------
+This software has been approved for release by the U.S. Geological Survey 
+(USGS). Although the software has been subjected to rigorous review,
+the USGS reserves the right to update the software as needed pursuant to
+further analysis and review. No warranty, expressed or implied, is made by
+the USGS or the U.S. Government as to the functionality of the software and
+related material nor shall the fact of release constitute any such warranty.
+Furthermore, the software is released on condition that neither the USGS nor
+the U.S. Government shall be held liable for any damages resulting from
+its authorized or unauthorized use.
+
+Any use of trade, product or firm names is for descriptive purposes only and
+does not imply endorsement by the U.S. Geological Survey.
+
+Although this information product, for the most part, is in the public domain,
+it also contains copyrighted material as noted in the text. Permission to
+reproduce copyrighted items for other than personal use must be secured from
+the copyright owner.
+------------------------------------------------------------------------------
+"""
+
+import os
+import re
+import json
+import sqlite3
+import collections
+
+import pandas as pd
+from lxml import etree
+from defusedxml import DefusedXmlException
+
+from pymdwizard.core import xml_utils
+from pymdwizard.core.batch_utils import hash_file
+
+SEARCH_FIELDS = collections.OrderedDict(
+    [
+        ("title", "idinfo/citation/citeinfo/title"),
+        ("abstract", "idinfo/descript/abstract"),
+        ("purpose", "idinfo/descript/purpose"),
+        ("themekey", "idinfo/keywords/theme/themekey"),
+        ("placekey", "idinfo/keywords/place/placekey"),
+        ("origin", "idinfo/citation/citeinfo/origin"),
+    ]
+)
+
+SearchResult = collections.namedtuple("SearchResult", ["fname", "score", "snippet"])
+
+# a quoted phrase, a parenthesis or anything else up to the next space
+_QUERY_TERM = re.compile(r'"(?:[^"]|"")*"|[()]|[^\s()]+')
+_BAREWORD = re.compile(r"\w+\*?")
+_OPERATORS = ("AND", "OR", "NOT")
+
+# the messages of the sqlite errors caused by the syntax of a query
+_QUERY_ERRORS = ("fts5: syntax error", "no such column", "unterminated string")
+
+
+def _quote_terms(query):
+    """
+    Put double quotes around the words of a search query that are not
+    valid FTS5 barewords, e.g. U.S. or bear-cub, so that they are
+    searched for as phrases.  Phrases, parentheses and the AND, OR and
+    NOT operators are kept as they are.
+
+    Parameters
+    ----------
+    query : str
+
+    Returns
+    -------
+    str
+    """
+    terms = []
+    for term in _QUERY_TERM.findall(query):
+        is_phrase = len(term) > 1 and term[0] == term[-1] == '"'
+        if not (
+            is_phrase
+            or term in "()"
+            or term in _OPERATORS
+            or _BAREWORD.fullmatch(term)
+        ):
+            term = '"{}"'.format(term.replace('"', '""'))
+        terms.append(term)
+    return " ".join(terms)
+
+
+class SearchIndex(object):
+    """
+    SQLite FTS5 index of the text of chosen fields of many records.
+
+    Each file is stored with its modification time, size and the sha256
+    hash of its contents, so update only reads the files that changed.
+    """
+
+    def __init__(self, fname, fields=None):
+        """
+        Parameters
+        ----------
+        fname : str
+                file path/name of the sqlite database to use,
+                it will be created if it does not exist.
+        fields : dict, optional
+                {field name: xpath} of the text to index, the xpaths are
+                relative to the root element.  Defaults to SEARCH_FIELDS.
+                If an existing index was built with different fields
+                it is rebuilt.
+        """
+        if fields is None:
+            fields = SEARCH_FIELDS
+        self.fields = collections.OrderedDict(fields)
+        for field in self.fields:
+            if not field.isidentifier():
+                raise ValueError("Invalid field name: {}".format(field))
+        self._xpaths = [etree.XPath(xpath) for xpath in self.fields.values()]
+
+        self.fname = fname
+        # {file name: error message} of the files the last update could
+        # not read
+        self.failed = {}
+        self.connection = sqlite3.connect(fname)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE key='fields'"
+        ).fetchone()
+        fields_json = json.dumps(self.fields)
+        if row is None or row[0] != fields_json:
+            self.connection.execute("DROP TABLE IF EXISTS files")
+            self.connection.execute("DROP TABLE IF EXISTS records")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO settings VALUES ('fields', ?)", (fields_json,)
+            )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "fname TEXT PRIMARY KEY, mtime REAL, size INTEGER, content_hash TEXT)"
+        )
+        self.connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS records USING fts5("
+            "fname UNINDEXED, {}, tokenize='porter unicode61')".format(
+                ", ".join(self.fields)
+            )
+        )
+        self.connection.commit()
+
+    def _extract(self, fname):
+        """
+        The text of each field of a record
+        """
+        root = xml_utils.fname_to_node(fname).getroot()
+        values = []
+        for xpath in self._xpaths:
+            texts = []
+            for match in xpath(root):
+                if isinstance(match, str):
+                    texts.append(match.strip())
+                elif isinstance(match.tag, str) and match.text:
+                    texts.append(match.text.strip())
+            values.append(" ".join(texts))
+        return values
+
+    def update(self, locator, recursive=True, remove_missing=True):
+        """
+        Add new and changed records to the index
+
+        Parameters
+        ----------
+        locator : str or list of str
+                directory, glob pattern, file name or list of these,
+                see xml_utils.find_xml_files
+        recursive : bool, optional
+                Whether to include files in subdirectories of a directory
+        remove_missing : bool, optional
+                Remove records whose files no longer exist from the index
+
+        Returns
+        -------
+        dict : the number of files 'added', 'updated', 'unchanged',
+                'removed' and the number that could not be read ('errors'),
+                the error message for each of those is stored in failed
+        """
+        self.failed = {}
+        counts = dict.fromkeys(
+            ["added", "updated", "unchanged", "removed", "errors"], 0
+        )
+        known = dict(
+            (row[0], row[1:])
+            for row in self.connection.execute(
+                "SELECT fname, mtime, size, content_hash FROM files"
+            )
+        )
+
+        for fname in xml_utils.find_xml_files(locator, recursive=recursive):
+            try:
+                stat = os.stat(fname)
+                previous = known.get(fname)
+                if previous is not None and previous[:2] == (
+                    stat.st_mtime,
+                    stat.st_size,
+                ):
+                    counts["unchanged"] += 1
+                    continue
+
+                content_hash = hash_file(fname)
+                if previous is not None and previous[2] == content_hash:
+                    # touched but not changed
+                    self.connection.execute(
+                        "UPDATE files SET mtime=?, size=? WHERE fname=?",
+                        (stat.st_mtime, stat.st_size, fname),
+                    )
+                    counts["unchanged"] += 1
+                    continue
+
+                values = self._extract(fname)
+            except (OSError, etree.XMLSyntaxError, DefusedXmlException) as e:
+                self.failed[fname] = str(e)
+                counts["errors"] += 1
+                continue
+
+            self.connection.execute("DELETE FROM records WHERE fname=?", (fname,))
+            self.connection.execute(
+                "INSERT INTO records VALUES (?, {})".format(
+                    ", ".join("?" * len(values))
+                ),
+                [fname] + values,
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (fname, stat.st_mtime, stat.st_size, content_hash),
+            )
+            counts["updated" if previous is not None else "added"] += 1
+
+        if remove_missing:
+            for fname in known:
+                if not os.path.exists(fname):
+                    self.remove(fname)
+                    counts["removed"] += 1
+
+        self.connection.commit()
+        return counts
+
+    def remove(self, fname):
+        """
+        Remove a record from the index
+
+        Parameters
+        ----------
+        fname : str
+
+        Returns
+        -------
+        None
+        """
+        fname = os.path.abspath(fname)
+        self.connection.execute("DELETE FROM records WHERE fname=?", (fname,))
+        self.connection.execute("DELETE FROM files WHERE fname=?", (fname,))
+        self.connection.commit()
+
+    def search(self, query, fields=None, limit=20, as_dataframe=False):
+        """
+        Find the records that best match a query
+
+        Parameters
+        ----------
+        query : str
+                An FTS5 query, e.g. 'polar bear', '"polar bear"' or
+                'bear NOT grizzly'.  Words are matched on their stems.
+                If the query is not valid FTS5 syntax the words with
+                punctuation in them (e.g. U.S. or bear-cub) are searched
+                for as phrases.
+        fields : list of str, optional
+                Only search these fields, e.g. ['abstract', 'themekey']
+        limit : int, optional
+                The maximum number of results
+        as_dataframe : bool
+                used to specify return format (list of SearchResult or
+                dataframe)
+
+        Returns
+        -------
+            list of SearchResult namedtuples (fname, score, snippet),
+            best match first (lowest bm25 score)
+            or
+            pandas dataframe
+
+        Raises
+        ------
+        ValueError if the query is not valid FTS5 syntax, even after
+        quoting the words with punctuation
+        """
+        try:
+            rows = self._match(query, fields, limit)
+        except sqlite3.OperationalError as e:
+            if not str(e).startswith(_QUERY_ERRORS):
+                raise
+            try:
+                rows = self._match(_quote_terms(query), fields, limit)
+            except sqlite3.OperationalError as e:
+                if not str(e).startswith(_QUERY_ERRORS):
+                    raise
+                raise ValueError(
+                    "Invalid search query {!r} ({}).  Use double quotes around "
+                    "phrases, AND, OR and NOT between words and parentheses "
+                    "for grouping.".format(query, e)
+                )
+        results = [SearchResult(*row) for row in rows]
+        if as_dataframe:
+            return pd.DataFrame.from_records(results, columns=SearchResult._fields)
+        return results
+
+    def _match(self, query, fields, limit):
+        """
+        Run an FTS5 query, see search
+        """
+        if fields:
+            query = "{{{}}} : ({})".format(" ".join(fields), query)
+        return self.connection.execute(
+            "SELECT fname, bm25(records), "
+            "snippet(records, -1, '[', ']', '...', 12) "
+            "FROM records WHERE records MATCH ? ORDER BY bm25(records) LIMIT ?",
+            (query, limit),
+        ).fetchall()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
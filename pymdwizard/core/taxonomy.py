@@ -276,10 +276,10 @@ def get_full_record_from_tsn(tsn, as_dataframe=False, **kwargs):
 
     results = _get_xml(
         ITIS_BASE_URL + "getFullRecordFromTSN", payload={"tsn": tsn}
-    ).getchildren()[0]
+    )[0]
     if as_dataframe:
         dfs = collections.OrderedDict()
-        for child in results.getchildren():
+        for child in results:
             df = xml_utils.element_to_df([child]).dropna()
             dfs[xml_utils.parse_tag(child.tag)] = df
         return dfs
@@ -49,12 +49,23 @@ the copyright owner.
 
 # built in Python imports
 import os
+import re
+import copy
+import glob
+import bisect
+import uuid
+import marshal
+import hashlib
+import tempfile
 import collections
+import functools
 import warnings
+import multiprocessing
 from pathlib import Path
 import unicodedata
 
 from defusedxml import lxml
+from defusedxml import DefusedXmlException
 from lxml import etree as etree
 
 try:
@@ -96,7 +107,7 @@ def save_to_file(element, fname):
     Save the provided element as the filename provided
     Parameters
     ----------
-    element : lxml element
+    element : lxml element or XMLNode
     fname : str
 
     Returns
@@ -107,7 +118,10 @@ def save_to_file(element, fname):
 
     file = codecs.open(fname, "w", "utf-8")
 
-    file.write(node_to_string(element))
+    if isinstance(element, XMLNode):
+        file.write(element.to_str(xml_declaration=True))
+    else:
+        file.write(node_to_string(element))
     file.close()
 
 
@@ -126,18 +140,18 @@ def node_to_dict(node, add_fgdc=True):
     """
     node_dict = collections.OrderedDict()
 
-    if len(node.getchildren()) == 0:
+    if len(node) == 0:
         tag = parse_tag(node.tag)
         if add_fgdc:
             tag = "fgdc_" + tag
         node_dict[tag] = node.text
     else:
-        for child in node.getchildren():
+        for child in node:
             try:
                 tag = parse_tag(child.tag)
                 if add_fgdc:
                     tag = "fgdc_" + tag
-                if len(child.getchildren()) > 0:
+                if len(child) > 0:
                     content = node_to_dict(child, add_fgdc=add_fgdc)
                 else:
                     content = child.text
@@ -187,7 +201,12 @@ def search_xpath(node, xpath, only_first=True):
 
     Parameters
     ----------
-    node : lxml node
+    node : lxml node, XMLNode or XMLRecord
+        XMLNodes are searched through the lxml element they were
+        loaded from if they have not been modified since, otherwise
+        through the output of to_xml, see XMLNode.get_element.
+        Either way the matching elements have the (stripped) text of
+        their nodes.
 
     xpath : string
         xpath.search
@@ -201,13 +220,20 @@ def search_xpath(node, xpath, only_first=True):
     -------
     list of lxml nodes
     """
+    if isinstance(node, XMLRecord):
+        node = node._contents
+    source = isinstance(node, XMLNode) and node._synced
+    if isinstance(node, XMLNode):
+        node = node.get_element()
 
     if type(node) in [
         lxml._etree._Element,
         lxml._etree._ElementTree,
         lxml.RestrictedElement,
     ]:
-        matches = node.xpath(xpath)
+        matches = compile_xpath(xpath)(node)
+        if source and type(matches) == list:
+            _strip_text(matches)
         if len(matches) == 0:
             if only_first:
                 return None
@@ -226,6 +252,80 @@ def search_xpath(node, xpath, only_first=True):
             return []
 
 
+def _strip_text(matches):
+    """
+    Give the elements found in the element an XMLNode was loaded from
+    the text that to_xml would give them, without the whitespace around
+    the text in the source.  Only the matching elements are changed.
+
+    Parameters
+    ----------
+    matches : list
+            the results of an xpath search
+
+    Returns
+    -------
+    None
+    """
+    for match in matches:
+        if isinstance(match, etree._Element) and isinstance(match.tag, str):
+            text = match.text
+            stripped = text.strip() if text else ""
+            if stripped != text and stripped and not len(match):
+                match.text = remove_control_characters(stripped)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_xpath(xpath):
+    """
+    Return a compiled lxml XPath object for an xpath, compiled xpaths
+    are cached so repeated searches do not parse the expression again
+
+    Parameters
+    ----------
+    xpath : str
+
+    Returns
+    -------
+    lxml.etree.XPath
+    """
+    return etree.XPath(xpath)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_xpath(xpath):
+    """
+    Split a simple xpath (tags and indexes only) into its steps,
+    parsed xpaths are cached
+
+    Parameters
+    ----------
+    xpath : str
+        e.g. 'idinfo/citation/citeinfo/origin[2]'
+
+    Returns
+    -------
+    tuple of (item, tag, index, indexed) tuples, one for each step.
+    index is zero based, tag is None if the item could not be parsed
+    """
+    if not xpath:
+        return ()
+
+    items = xpath.split("/")
+    if items[-1] == "":
+        # a trailing slash matches the element itself
+        items.pop()
+
+    steps = []
+    for item in items:
+        try:
+            tag, index = split_tag(item)
+        except ValueError:
+            tag, index = None, 0
+        steps.append((item, tag, index, "[" in item))
+    return tuple(steps)
+
+
 def get_text_content(node, xpath=""):
     """
     return the text from a specific node
@@ -272,7 +372,114 @@ def remove_control_characters(s):
     string
     """
     s = str(s)
-    return "".join(ch for ch in s if unicodedata.category(ch)[0] != "C" or ch in ['\n', '\t'])
+    if s.replace("\n", "").replace("\t", "").isprintable():
+        # nothing to remove, every control/format character is unprintable
+        return s
+    return s.translate(_CONTROL_CHARACTERS)
+
+
+class _ControlCharacterTable(dict):
+    """
+    str.translate table that deletes the unicode control (category 'C')
+    characters other than newline and tab.  The C0/C1 controls are filled in
+    up front, any other character is classified the first time it is seen.
+    """
+
+    def __init__(self):
+        super().__init__()
+        for code in list(range(0x20)) + list(range(0x7F, 0xA0)):
+            self[code] = None
+        self[ord("\n")] = ord("\n")
+        self[ord("\t")] = ord("\t")
+
+    def __missing__(self, code):
+        value = None if unicodedata.category(chr(code))[0] == "C" else code
+        self[code] = value
+        return value
+
+
+_CONTROL_CHARACTERS = _ControlCharacterTable()
+
+
+def sanitize(node):
+    """
+    Remove control characters from the text of every element in a record,
+    see remove_control_characters.  The whole document is checked in one
+    pass so that the per node check in xml_node and when rendering finds
+    nothing to do.
+
+    Parameters
+    ----------
+    node : XMLRecord, XMLNode or lxml element
+
+    Returns
+    -------
+    list of str
+        The xpath of each element whose text was changed,
+        e.g. 'metadata/dataqual/lineage/procstep[2]/procdesc'
+    """
+    if isinstance(node, XMLRecord):
+        node = node._contents
+
+    if isinstance(node, XMLNode):
+        modified = []
+        stack = [(node, node.tag)]
+        while stack:
+            item, xpath = stack.pop()
+            if item.text:
+                text = remove_control_characters(item.text)
+                if text != item.text:
+                    item.text = text
+                    modified.append(xpath)
+            children = item.children
+            if children:
+                child_xpaths = _child_xpaths(xpath, children)
+                stack.extend(reversed(list(zip(children, child_xpaths))))
+        return modified
+
+    return _sanitize_element(node)
+
+
+def _sanitize_element(node):
+    """
+    sanitize for an lxml element, see sanitize
+    """
+    modified = []
+    for element in node.iter(tag=etree.Element):
+        if element.text:
+            text = remove_control_characters(element.text)
+            if text != element.text:
+                element.text = text
+                modified.append(element)
+    tree = node.getroottree()
+    return [tree.getpath(element).lstrip("/") for element in modified]
+
+
+def _escape_text(text):
+    """
+    Escape the characters that are not allowed in the text of an xml
+    element, matching lxml's serialization of element text.
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    str
+    """
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    return text
+
+
+_MISSING = float("nan")
 
 
 def element_to_df(results):
@@ -282,6 +489,10 @@ def element_to_df(results):
     homogeneous elements.
     For nested or hierarchical data structures this result will be awkward.
 
+    The results are walked once, appending each child's text to a list per
+    column, so large web-service responses don't build an intermediate
+    dictionary per row.
+
     Parameters
     ----------
     results : list of lxml nodes
@@ -291,8 +502,66 @@ def element_to_df(results):
     -------
     pandas dataframe
     """
-    results_list = element_to_list(results)
-    return pd.DataFrame.from_dict(results_list)
+    columns = collections.OrderedDict()
+    tags = {}
+    row_count = 0
+    for item in results:
+        if len(item) == 0:
+            cells = [(parse_tag(item.tag), item.text)]
+        else:
+            cells = _element_cells(item, tags)
+
+        filled = 0
+        for tag, value in cells:
+            column = columns.get(tag)
+            if column is None:
+                columns[tag] = [_MISSING] * row_count + [value]
+                filled += 1
+            elif len(column) > row_count:
+                column[row_count] = value  # repeated tag, last one wins
+            else:
+                column.append(value)
+                filled += 1
+
+        row_count += 1
+        if filled < len(columns):
+            for column in columns.values():
+                if len(column) < row_count:
+                    column.append(_MISSING)
+
+    if not columns:
+        return pd.DataFrame.from_dict([{}] * row_count)
+    return pd.DataFrame(columns, columns=list(columns), index=range(row_count))
+
+
+def _element_cells(item, tags):
+    """
+    Returns the (tag, value) pairs that node_to_dict would return for the
+    children of a single result element.
+
+    Parameters
+    ----------
+    item : lxml element
+    tags : dict
+        Cache of namespaced tag to parsed tag, shared across the results
+
+    Returns
+    -------
+    list of (tag, value) tuples
+    """
+    cells = []
+    for child in item:
+        if not isinstance(child.tag, str):
+            continue  # this node was a comment or processing instruction
+        if len(child) > 0:
+            value = node_to_dict(child, add_fgdc=False)
+        else:
+            value = child.text
+        tag = tags.get(child.tag)
+        if tag is None:
+            tag = tags[child.tag] = parse_tag(child.tag)
+        cells.append((tag, value))
+    return cells
 
 
 def node_to_string(node, encoding=True):
@@ -337,6 +606,80 @@ def fname_to_node(fname):
     return lxml.parse(fname)
 
 
+SECTIONS = ("idinfo", "dataqual", "spdoinfo", "spref", "eainfo", "distinfo", "metainfo")
+
+
+def iter_sections(fname, paths=SECTIONS):
+    """
+    Read a record one piece at a time, without loading the whole document.
+
+    Yields each element found at one of the given paths as soon as it has
+    been parsed.  Once the next element is requested the previous one is
+    cleared and removed from the document, along with any other content
+    that is not on the way to one of the paths, so memory use is bounded
+    by the size of the largest single element yielded.
+
+    Parameters
+    ----------
+    fname : str or file object
+            the xml file to read
+    paths : list of str
+            The paths of the elements to yield, relative to the root, e.g.
+            'idinfo', 'eainfo/detailed' or 'eainfo/detailed/attr'.
+            Defaults to the top level CSDGM sections.
+            If one requested element contains another, the inner one is
+            yielded (and removed) first.
+
+    Returns
+    -------
+    generator of (xpath, lxml element)
+        where xpath is the path from the root, with the position of each
+        element, e.g. 'metadata/eainfo[1]/detailed[1]/attr[3]'
+        The element is only valid until the next one is requested,
+        use copy.deepcopy to keep it.
+    """
+    requested = set(tuple(path.strip("/").split("/")) for path in paths)
+    on_the_way = set(path[:i] for path in requested for i in range(len(path)))
+
+    # for each open element: tags below the root, xpath, whether it is part of
+    # an element that will be yielded, whether it will be yielded,
+    # and the number of each child tag seen so far
+    stack = []
+    for event, element in etree.iterparse(
+        fname, events=("start", "end"), resolve_entities=False, no_network=True
+    ):
+        if event == "start":
+            if not stack:
+                stack.append(((), element.tag, False, False, collections.Counter()))
+                continue
+            tags, xpath, inside, matched, counts = stack[-1]
+            counts[element.tag] += 1
+            tags = tags + (element.tag,)
+            xpath = "{}/{}[{}]".format(xpath, element.tag, counts[element.tag])
+            stack.append(
+                (
+                    tags,
+                    xpath,
+                    inside or matched,
+                    tags in requested,
+                    collections.Counter(),
+                )
+            )
+            continue
+
+        tags, xpath, inside, matched, counts = stack.pop()
+        if matched:
+            yield xpath, element
+        elif inside or not stack or tags in on_the_way:
+            continue
+
+        # we are done with this element and everything before it
+        element.clear()
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
 def string_to_node(str_node):
     """
     covert a string representation of a node into an lxml node object
@@ -394,6 +737,185 @@ def xml_node(tag, text="", parent_node=None, index=-1, comment=False):
     return node
 
 
+def find_xml_files(locator, recursive=True):
+    """
+    Return a sorted list of the xml files referenced by a locator
+
+    Parameters
+    ----------
+    locator : str or list of str
+              can be one of:
+                  a directory, all the .xml files in it are returned
+                  a glob pattern, e.g. 'c:/temp/**/*.xml'
+                  a single file name
+                  a list of any of the above
+    recursive : bool, optional
+              Whether to include the contents of subdirectories when
+              locator is a directory (or a glob pattern using '**')
+
+    Returns
+    -------
+        list of str
+    """
+    if not isinstance(locator, str):
+        fnames = set()
+        for item in locator:
+            fnames.update(find_xml_files(item, recursive=recursive))
+        return sorted(fnames)
+
+    if os.path.isdir(locator):
+        if recursive:
+            pattern = os.path.join(locator, "**", "*.xml")
+        else:
+            pattern = os.path.join(locator, "*.xml")
+    else:
+        pattern = locator
+
+    return sorted(
+        os.path.abspath(f)
+        for f in glob.glob(pattern, recursive=recursive)
+        if os.path.isfile(f)
+    )
+
+
+REPORT_XPATHS = collections.OrderedDict(
+    [
+        ("title", "idinfo/citation/citeinfo/title"),
+        ("abstract", "idinfo/descript/abstract"),
+        ("westbc", "idinfo/spdom/bounding/westbc"),
+        ("eastbc", "idinfo/spdom/bounding/eastbc"),
+        ("northbc", "idinfo/spdom/bounding/northbc"),
+        ("southbc", "idinfo/spdom/bounding/southbc"),
+        ("themekey", "idinfo/keywords/theme/themekey"),
+        ("placekey", "idinfo/keywords/place/placekey"),
+        ("origin", "idinfo/citation/citeinfo/origin"),
+        ("cntemail", "idinfo/ptcontac/cntinfo/cntemail"),
+    ]
+)
+
+
+def _compile_extract_xpaths(xpaths):
+    return [(column, etree.XPath(xpath)) for column, xpath in xpaths]
+
+
+# the compiled xpaths of the extract_records process pool workers,
+# compiled xpaths can not be pickled so each worker compiles its own
+_POOL_XPATHS = None
+
+
+def _set_pool_xpaths(xpaths):
+    global _POOL_XPATHS
+    _POOL_XPATHS = _compile_extract_xpaths(xpaths)
+
+
+def _extract_pool_values(fname, sep):
+    return _extract_values(_POOL_XPATHS, sep, fname)
+
+
+def _extract_values(compiled, sep, fname):
+    """
+    Extract the values of the compiled xpaths from one file
+    """
+    try:
+        root = fname_to_node(fname).getroot()
+    except (etree.XMLSyntaxError, OSError, DefusedXmlException) as e:
+        return [fname, str(e)] + [None] * len(compiled)
+
+    values = [fname, None]
+    for column, xpath in compiled:
+        matches = xpath(root)
+        if not isinstance(matches, list):
+            # xpath functions, e.g. count(...), return a single value
+            values.append(matches)
+            continue
+        texts = []
+        for match in matches:
+            if isinstance(match, str):
+                texts.append(str(match))
+            elif isinstance(match.tag, str) and match.text is not None:
+                texts.append(match.text.strip())
+        if sep is None:
+            values.append(texts)
+        elif texts:
+            values.append(sep.join(texts))
+        else:
+            values.append(None)
+    return values
+
+
+def extract_records(
+    locator, xpaths=None, out_fname=None, processes=None, sep="; ", recursive=True
+):
+    """
+    Extract values from many records into a table, one row per file.
+
+    The xpaths are compiled once in each process of a pool, and a
+    missing element gives a missing value rather than an error.
+
+    Parameters
+    ----------
+    locator : str or list of str
+            directory, glob pattern, file name or list of these,
+            see find_xml_files
+    xpaths : dict or list of str, optional
+            {column name: xpath} of the values to extract, a list of xpaths
+            uses the xpaths as column names.  The xpaths are relative to the
+            root element.  Defaults to REPORT_XPATHS (title, abstract,
+            bounding coordinates, keywords and contacts)
+    out_fname : str, optional
+            If provided the table is also written to this file, the format
+            is taken from the extension: .parquet, .feather or .csv
+            (parquet and feather require pyarrow)
+    processes : int, optional
+            The number of processes to use, None uses one per cpu
+    sep : str or None, optional
+            The string used to join the text of multiple matching elements,
+            if None each value is a list of the matching texts
+    recursive : bool, optional
+            Whether to include files in subdirectories of a directory
+
+    Returns
+    -------
+    pandas dataframe
+        with an 'fname' column, an 'error' column (the error message for
+        files that could not be parsed) and a column for each xpath
+    """
+    if xpaths is None:
+        xpaths = REPORT_XPATHS
+    if isinstance(xpaths, dict):
+        xpaths = list(xpaths.items())
+    else:
+        xpaths = [(xpath, xpath) for xpath in xpaths]
+    columns = ["fname", "error"] + [column for column, xpath in xpaths]
+
+    fnames = find_xml_files(locator, recursive=recursive)
+    if processes == 1 or len(fnames) <= 1:
+        extract = functools.partial(
+            _extract_values, _compile_extract_xpaths(xpaths), sep
+        )
+        rows = [extract(fname) for fname in fnames]
+    else:
+        pool = multiprocessing.Pool(
+            processes, initializer=_set_pool_xpaths, initargs=(xpaths,)
+        )
+        try:
+            extract = functools.partial(_extract_pool_values, sep=sep)
+            rows = pool.map(extract, fnames, chunksize=16)
+        finally:
+            pool.terminate()
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    if out_fname is not None:
+        extension = os.path.splitext(out_fname)[1].lower()
+        if extension == ".parquet":
+            df.to_parquet(out_fname)
+        elif extension == ".feather":
+            df.to_feather(out_fname)
+        else:
+            df.to_csv(out_fname, index=False)
+    return df
+
+
 def load_xslt(fname):
     return etree.XSLT(fname_to_node(fname))
 
@@ -413,12 +935,14 @@ def clear_children(element):
     -------
     None
     """
-    for child in element.getchildren():
+    for child in list(element):
         element.remove(child)
 
 
 class XMLRecord(object):
-    def __init__(self, contents):
+    def __init__(
+        self, contents, lazy=False, index=False, cache=None, sanitize=False
+    ):
         """
         contents must be one of the following
 
@@ -430,7 +954,34 @@ class XMLRecord(object):
         ----------
         contents : str, lxml node
                 url, file path, string xml snippet
+        lazy : bool, optional
+                If True the XMLNode for each element is only created the
+                first time it (or one of its siblings) is accessed,
+                see XMLNode.  Useful when only a handful of fields are
+                needed from each of many records.
+        index : bool, optional
+                If True build an index from each tag to all of the nodes
+                with that tag, see find_all
+        cache : RecordCache or bool, optional
+                Only used when contents is a file name.
+                If provided the parsed record is read from (or stored in)
+                this on disk cache, True uses the default RecordCache
+                (if its directory is not private a warning is given and
+                the record is loaded without it).
+                Records read from the cache are not lazy and are only
+                parsed with lxml if record is accessed.
+        sanitize : bool, optional
+                If True remove control characters from the whole record
+                as it is loaded, the xpaths of the elements that were
+                changed are stored in sanitized.
         """
+        self.sanitized = []
+        if cache is True:
+            try:
+                cache = get_record_cache()
+            except OSError as e:
+                warnings.warn("Not using the record cache: {}".format(e))
+                cache = None
         try:
             contents_path = Path(contents)
             try:
@@ -440,9 +991,22 @@ class XMLRecord(object):
 
             if exists:
                 self.fname = str(contents_path.absolute())
+                tokens = cache.get(self.fname) if cache else None
+                if tokens is not None:
+                    self.tag = tokens[0]
+                    self.__dict__[self.tag] = XMLNode._from_tokens(tokens)
+                    self._contents = self.__dict__[self.tag]
+                    if sanitize:
+                        self.sanitize()
+                    if index:
+                        self._contents.build_index()
+                    return
+
                 # they passde us a file path
                 self.record = lxml.parse(self.fname)
                 self._root = self.record.getroot()
+                if cache:
+                    cache.put(self.fname, self._root)
             else:
                 from pymdwizard.core import utils
 
@@ -468,9 +1032,28 @@ class XMLRecord(object):
             self.record = lxml.fromstring(contents)
             self._root = self.record.getroot()
 
+        if sanitize:
+            self.sanitized = _sanitize_element(self._root)
+
         self.tag = self._root.tag
-        self.__dict__[self._root.tag] = XMLNode(self.record.getroot())
+        self.__dict__[self._root.tag] = XMLNode(self.record.getroot(), lazy=lazy)
         self._contents = self.__dict__[self._root.tag]
+        if index:
+            self._contents.build_index()
+
+    def __getattr__(self, name):
+        """
+        Only called when normal attribute lookup fails.
+        Records loaded from a RecordCache parse the file with lxml the
+        first time record is accessed.
+        """
+        if name in ("record", "_root") and self.__dict__.get("fname"):
+            self.record = lxml.parse(self.fname)
+            self._root = self.record.getroot()
+            return self.__dict__[name]
+        raise AttributeError(
+            "'XMLRecord' object has no attribute '{}'".format(name)
+        )
 
     def __repr__(self):
         return self.__str__()
@@ -481,10 +1064,58 @@ class XMLRecord(object):
     def serialize(self):
         return self.__str__()
 
-    def save(self, fname=""):
+    def save(self, fname="", sanitize=False):
+        """
+        Save the record to disk
+
+        Parameters
+        ----------
+        fname : str, optional
+                Defaults to the file the record was read from
+        sanitize : bool, optional
+                If True remove control characters from the whole record
+                before it is written, see sanitize
+
+        Returns
+        -------
+        None
+        """
         if not fname:
             fname = self.fname
-        save_to_file(self._contents.to_xml(), fname)
+        if sanitize:
+            self.sanitize()
+        save_to_file(self._contents, fname)
+
+    def sanitize(self):
+        """
+        Remove control characters from the text of every element in the
+        record.
+
+        Returns
+        -------
+        list of str
+            The xpath of each element whose text was changed,
+            these are also stored in sanitized
+        """
+        self.sanitized = sanitize(self._contents)
+        return self.sanitized
+
+    def find_all(self, tag):
+        """
+        Return every element with a given tag anywhere in the record.
+        This is a dictionary lookup if the record was created with
+        index=True, otherwise the whole record is searched.
+
+        Parameters
+        ----------
+        tag : str
+              e.g. 'onlink'
+
+        Returns
+        -------
+        list of XMLNodes
+        """
+        return self._contents.find_all(tag)
 
     def validate(self, schema="fgdc", as_dataframe=True):
         """
@@ -518,13 +1149,113 @@ class XMLRecord(object):
         )
 
 
+def _list_changes(before, after):
+    """
+    The items that were added to and removed from a list of XMLNodes
+
+    Parameters
+    ----------
+    before : list of XMLNodes
+    after : list of XMLNodes
+
+    Returns
+    -------
+    tuple : (list of added XMLNodes, list of removed XMLNodes)
+    """
+    before_ids = set(map(id, before))
+    after_ids = set(map(id, after))
+    added = [node for node in after if id(node) not in before_ids]
+    removed = [node for node in before if id(node) not in after_ids]
+    return added, removed
+
+
+def _edits_children(method):
+    """
+    Wrap a list method so that the XMLNode the list belongs to is
+    updated after the list is changed
+    """
+
+    def edit(self, *args, **kwargs):
+        before = list(self)
+        result = method(self, *args, **kwargs)
+        self._node._children_changed(*_list_changes(before, self))
+        return result
+
+    edit.__name__ = method.__name__
+    edit.__doc__ = method.__doc__
+    return edit
+
+
+class _ChildList(list):
+    """
+    The children of an XMLNode.  Editing the list in place
+    (node.children.append(child), del node.children[0], ...) updates the
+    node in the same way as assigning a new list to node.children.
+    """
+
+    __slots__ = ("_node",)
+
+    def __init__(self, node, children=()):
+        list.__init__(self, children)
+        self._node = node
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def append(self, child):
+        list.append(self, child)
+        self._node._children_changed(added=[child])
+
+    def insert(self, index, child):
+        list.insert(self, index, child)
+        self._node._children_changed(added=[child])
+
+    def extend(self, children):
+        children = list(children)
+        list.extend(self, children)
+        self._node._children_changed(added=children)
+
+    __iadd__ = _edits_children(list.__iadd__)
+    __imul__ = _edits_children(list.__imul__)
+    __setitem__ = _edits_children(list.__setitem__)
+    __delitem__ = _edits_children(list.__delitem__)
+    remove = _edits_children(list.remove)
+    pop = _edits_children(list.pop)
+    clear = _edits_children(list.clear)
+    sort = _edits_children(list.sort)
+    reverse = _edits_children(list.reverse)
+
+
 class XMLNode(object):
     """
     Class used to dynamically create an object containing the contents of an
     XML node, along with functions for manipulating and introspecting it.
+
+    The children of a node can be accessed as attributes by their tag,
+    e.g. node.idinfo.citation returns the citation child (or a list of
+    them if there is more than one).  The children are stored once, in
+    children, and looked up through a map from each tag to its positions.
     """
 
-    def __init__(self, element=None, tag="", text="", parent_node=None, index=-1):
+    __slots__ = (
+        "tag",
+        "_text",
+        "_children",
+        "_positions",
+        "_attrs",
+        "element",
+        "widget",
+        "_pending",
+        "_lazy",
+        "_digest",
+        "_synced",
+        "_parent",
+        "_tag_index",
+    )
+
+    def __init__(
+        self, element=None, tag="", text="", parent_node=None, index=-1, lazy=False
+    ):
         """
         Initialization function.
 
@@ -541,13 +1272,16 @@ class XMLNode(object):
         index : int, optional
                 if provided insert this XMLNode into the parent node at this
                 position
+        lazy : bool, optional
+                Only used when element is an lxml element.
+                If True the child XMLNodes are not created until the children
+                or one of the child attributes of this node are accessed.
+                Children are expanded one level at a time, and are lazy too.
         """
-        self.text = text
-        self.tag = tag
-        self.children = []
+        self._init_fields(tag, text)
 
         if isinstance(element, etree._Element):
-            self.from_xml(element)
+            self.from_xml(element, lazy=lazy)
         elif tag:
             element = xml_node(tag=tag, text=text)
             self.from_xml(element)
@@ -557,6 +1291,27 @@ class XMLNode(object):
         if parent_node is not None:
             parent_node.add_child(self, index=index, deepcopy=False)
 
+    def _init_fields(self, tag, text):
+        """
+        Set the internal fields every new node has.  The other slots are
+        only set when they are needed, until then reading them gives the
+        value in _SLOT_DEFAULTS.  They are set directly, so that creating
+        a node skips the bookkeeping in __setattr__.
+
+        Parameters
+        ----------
+        tag : str
+        text : str
+
+        Returns
+        -------
+        None
+        """
+        _set_slot(self, "tag", tag)
+        _set_slot(self, "_text", text)
+        _set_slot(self, "_children", _ChildList(self))
+        _set_slot(self, "_pending", False)
+
     def __repr__(self):
         """
         return representation of this object
@@ -579,25 +1334,63 @@ class XMLNode(object):
         -------
         str representation of this element, pretty print of entire contents.
         """
+        parts = []
+        self._render(parts, level)
+        return "".join(parts)
+
+    def _render(self, parts, level, as_document=False):
+        """
+        Append the pretty printed representation of this element to parts.
+        The output is accumulated in a single list and joined once by the
+        caller.
+
+        Parameters
+        ----------
+        parts : list of str
+                The buffer to append to
+        level : int
+                Number of double spaces "  " to indent the resulting output to
+        as_document : bool
+                If False non-ascii characters are written as character
+                references, and empty leaf elements as <tag></tag>
+                (the __str__ format).
+                If True they are written as is, and as <tag/>
+                (the node_to_string format).
+
+        Returns
+        -------
+        None
+        """
+        indent = "  " * level
         if self.text:
-            cur_node = xml_node(self.tag, self.text)
-            result = "{}{}".format(
-                "  " * level, lxml.tostring(cur_node, pretty_print=True).decode()
-            )
-            result = result.rstrip()
+            text = _escape_text(remove_control_characters(self.text))
+            if not as_document:
+                text = text.encode("ascii", "xmlcharrefreplace").decode("ascii")
+            elif not text:
+                parts.append("{}<{}/>".format(indent, self.tag))
+                return
+            parts.append("{}<{}>{}</{}>".format(indent, self.tag, text, self.tag))
         else:
-            result = "{}<{}>".format("  " * level, self.tag, self.tag)
-            for child in self.children:
-                if type(self.__dict__[child.tag]) == XMLNode:
-                    child = self.__dict__[child.tag]
-                result += "\n" + child.__str__(level=level + 1)
-            result += "\n{}</{}>".format("  " * level, self.tag)
-        return result
+            parts.append("{}<{}>".format(indent, self.tag))
+            for child in self._render_children():
+                parts.append("\n")
+                child._render(parts, level + 1, as_document)
+            parts.append("\n{}</{}>".format(indent, self.tag))
+
+    def _render_children(self):
+        """
+        The children that are included when this node is rendered.
+
+        Returns
+        -------
+        list of XMLNodes
+        """
+        return self.children
 
     def __eq__(self, other):
         """
         Check equality of XMLNode objects by comparing
-        their string representations
+        the digests of their string representations
 
         Parameters
         ----------
@@ -608,40 +1401,534 @@ class XMLNode(object):
         bool
         """
         if isinstance(other, self.__class__):
-            return self.to_str() == other.to_str()
+            return self is other or self.digest() == other.digest()
         return False
 
-    def from_xml(self, element):
+    def __hash__(self):
         """
-
-        Parameters
-        ----------
-        element
+        Hash based on the content digest, so that nodes with the same
+        contents collapse in sets and dictionary keys.
+        Note that the hash changes if the node is modified.
 
         Returns
         -------
+        int
+        """
+        return int.from_bytes(self.digest()[:8], "little")
 
+    def digest(self):
         """
-        self.element = element
-        self.tag = element.tag
-        self.add_attr(self.tag, self)
-        try:
-            self.text = element.text.strip()
-        except:
-            self.text = ""
+        Return a content digest of this node.
 
-        self.children = []
-        for child_node in self.element.getchildren():
-            child_object = XMLNode(child_node)
-            self.children.append(child_object)
-            self.add_attr(child_node.tag, child_object)
+        The digest is computed from the tag and text of this node and the
+        digests of its children (a Merkle tree), so two nodes have the same
+        digest exactly when their to_str representations are the same.
+        It is cached and only recomputed after this node or one of its
+        descendants is changed through add_child, clear_children,
+        replace_child, replace_string, by assigning to text or children,
+        or by editing children in place.
 
-    def add_attr(self, tag, child_object):
+        Returns
+        -------
+        bytes
         """
-        Add a child XMLNode to this object's attributes.
-        If there is already a child with this tag, make that
-        child a list containing the previous item, and append this chils
+        result = self._digest
+        if result is None:
+            hasher = hashlib.blake2b(str(self.tag).encode("utf-8"), digest_size=16)
+            if self.text:
+                hasher.update(b"\x00")
+                hasher.update(remove_control_characters(self.text).encode("utf-8"))
+            else:
+                hasher.update(b"\x01")
+                for child in self._render_children():
+                    hasher.update(child.digest())
+            result = hasher.digest()
+            _set_slot(self, "_digest", result)
+        return result
 
+    def _invalidate(self):
+        """
+        Clear the cached digest of this node and all of its ancestors,
+        and mark their source elements as out of date.
+
+        Returns
+        -------
+        None
+        """
+        if self._digest is None and not self._synced:
+            # our ancestors can only be clean if we are
+            return
+        _set_slot(self, "_digest", None)
+        _set_slot(self, "_synced", False)
+        for parent in self._parent_nodes():
+            parent._invalidate()
+
+    def _parent_nodes(self):
+        """
+        The nodes this node is a child of.
+        A node has a single parent, unless the same node has been added
+        to several nodes with add_child(deepcopy=False), only then are its
+        parents kept in a dict of id(parent) to parent.
+
+        Returns
+        -------
+        tuple or list of XMLNodes
+        """
+        parent = self._parent
+        if parent is None:
+            return ()
+        if type(parent) is dict:
+            return list(parent.values())
+        return (parent,)
+
+    def _add_parent(self, parent):
+        current = self._parent
+        if current is None or current is parent:
+            _set_slot(self, "_parent", parent)
+        elif type(current) is dict:
+            current[id(parent)] = parent
+        else:
+            _set_slot(self, "_parent", {id(current): current, id(parent): parent})
+
+    def _remove_parent(self, parent):
+        current = self._parent
+        if current is parent:
+            _set_slot(self, "_parent", None)
+        elif type(current) is dict:
+            current.pop(id(parent), None)
+            if len(current) == 1:
+                _set_slot(self, "_parent", next(iter(current.values())))
+
+    def _detach(self, removed):
+        """
+        Unlink children that have been removed from this node from it,
+        and drop them from the tag index of the record.
+
+        Parameters
+        ----------
+        removed : list of XMLNodes
+
+        Returns
+        -------
+        None
+        """
+        if not removed:
+            return
+        self._update_indexes(removed=removed)
+        for child in removed:
+            child._remove_parent(self)
+
+    def _children_changed(self, added=(), removed=()):
+        """
+        Update this node after its children were changed, either by
+        assigning to children or by editing the list in place:
+        link the added children to it, unlink the removed ones, and
+        clear the cached digests and tag map.
+
+        Parameters
+        ----------
+        added : list of XMLNodes
+        removed : list of XMLNodes
+
+        Returns
+        -------
+        None
+        """
+        _set_slot(self, "_positions", None)
+        for child in added:
+            child._add_parent(self)
+        self._detach(removed)
+        self._update_indexes(added=added)
+        self._invalidate()
+
+    def _find_indexes(self):
+        """
+        The tag indexes (see build_index) of the nodes this node belongs to
+
+        Returns
+        -------
+        list of dict
+        """
+        indexes = []
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            index = node._tag_index
+            if index is not None:
+                indexes.append(index)
+            stack.extend(node._parent_nodes())
+        return indexes
+
+    def _update_indexes(self, added=(), removed=()):
+        """
+        Add nodes to, or remove them (and their descendants) from, the tag
+        indexes this node belongs to.
+
+        Parameters
+        ----------
+        added : list of XMLNodes
+        removed : list of XMLNodes
+
+        Returns
+        -------
+        None
+        """
+        if not added and not removed:
+            return
+        for index in self._find_indexes():
+            for child in removed:
+                for node in child._walk():
+                    index.get(node.tag, {}).pop(id(node), None)
+            for child in added:
+                for node in child._walk():
+                    index[node.tag][id(node)] = node
+
+    def _walk(self):
+        """
+        Iterate over this node and all of its descendants in document order
+
+        Returns
+        -------
+        generator of XMLNodes
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def build_index(self):
+        """
+        Build an index from each tag to the nodes with that tag in this node
+        (including this node itself), so that find_all does not need to
+        walk the tree.  The index is kept up to date by add_child,
+        clear_children, replace_child and assigning to children,
+        nodes added afterwards are listed after the ones that were
+        indexed initially.  Lazy nodes are fully expanded.
+
+        Returns
+        -------
+        None
+        """
+        index = collections.defaultdict(dict)
+        for node in self._walk():
+            index[node.tag][id(node)] = node
+        self._tag_index = index
+
+    def find_all(self, tag):
+        """
+        Return every node with a given tag in this node, including this
+        node itself
+
+        Parameters
+        ----------
+        tag : str
+
+        Returns
+        -------
+        list of XMLNodes
+        """
+        index = self._tag_index
+        if index is None:
+            return [node for node in self._walk() if node.tag == tag]
+        return list(index.get(tag, {}).values())
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        _set_slot(self, "_text", text)
+        self._invalidate()
+
+    def __getattr__(self, name):
+        """
+        Only called when normal attribute lookup fails.
+        Return the child (or list of children) with this tag.
+        A node can also be accessed through its own tag.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        XMLNode or list of XMLNodes
+        """
+        if name in _SLOT_DEFAULTS:
+            return _SLOT_DEFAULTS[name]
+        if name in _NODE_SLOTS or name.startswith("__"):
+            # unset slots, and the special methods copy and pickle look for
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+            )
+
+        # fast path for a child when the tag map is up to date
+        positions = self._positions
+        if positions is not None and self._attrs is None and name != self.tag:
+            children = self._children
+            if positions[0] == len(children):
+                result = positions[1].get(name)
+                if result is not None and children[result[0]] is result[1][0]:
+                    nodes = result[1]
+                    return nodes[0] if len(nodes) == 1 else nodes
+
+        try:
+            return self._lookup(name)
+        except KeyError:
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+            )
+
+    def __setattr__(self, name, value):
+        """
+        Assigning an XMLNode to the tag of the only child with that tag
+        replaces that child.  Other attributes that are not part of
+        XMLNode are stored separately and take precedence over children
+        when they are read.
+
+        Parameters
+        ----------
+        name : str
+        value : object
+
+        Returns
+        -------
+        None
+        """
+        if name in _NODE_SLOTS or hasattr(XMLNode, name):
+            _set_slot(self, name, value)
+            return
+
+        if isinstance(value, XMLNode) and name != self.tag:
+            first, nodes = self._tag_children(name)
+            if len(nodes) == 1:
+                children = list(self.children)
+                children[first] = value
+                self.children = children
+                if self._attrs:
+                    self._attrs.pop(name, None)
+                return
+
+        if self._attrs is None:
+            self._attrs = {}
+        self._attrs[name] = value
+
+    def _tag_children(self, tag):
+        """
+        The children with a tag, from a map of tag to
+        (position of the first child with that tag, children with that tag)
+        which is rebuilt whenever the children change.
+
+        Parameters
+        ----------
+        tag : str
+
+        Returns
+        -------
+        tuple : (int, list of XMLNodes)
+        """
+        if self._pending:
+            self._expand()
+        children = self._children
+        positions = self._positions
+        if positions is not None and positions[0] == len(children):
+            result = positions[1].get(tag)
+            if result is None:
+                return -1, _NO_CHILDREN
+            if children[result[0]] is result[1][0]:
+                return result
+            # children was changed in place
+
+        tag_children = {}
+        for i, child in enumerate(children):
+            if child.tag in tag_children:
+                tag_children[child.tag][1].append(child)
+            else:
+                tag_children[child.tag] = (i, [child])
+        self._positions = (len(children), tag_children)
+        # the fast path in __getattr__ reads _attrs too, set it so that
+        # reading it doesn't fall back to __getattr__ for its default
+        _set_slot(self, "_attrs", self._attrs)
+        return tag_children.get(tag, (-1, _NO_CHILDREN))
+
+    def _lookup(self, name):
+        """
+        The value of the attribute name, see __getattr__
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        XMLNode, list of XMLNodes or the value of a custom attribute
+
+        Raises
+        ------
+        KeyError if there is no such attribute
+        """
+        if self._attrs and name in self._attrs:
+            return self._attrs[name]
+
+        matches = self._tag_children(name)[1]
+        if name == self.tag:
+            matches = [self] + list(matches)
+        if not matches:
+            raise KeyError(name)
+        elif len(matches) == 1:
+            return matches[0]
+        else:
+            return matches
+
+    @property
+    def children(self):
+        if self._pending:
+            self._expand()
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        if self._pending:
+            self._expand()
+        old_children = self._children
+        children = _ChildList(self, children)
+        _set_slot(self, "_children", children)
+        self._children_changed(*_list_changes(old_children, children))
+
+    def from_xml(self, element, lazy=False):
+        """
+
+        Parameters
+        ----------
+        element : lxml element
+        lazy : bool, optional
+                Postpone creating the child XMLNodes until they are accessed
+
+        Returns
+        -------
+
+        """
+        # a node that is reloaded is a change to its parents
+        self._invalidate()
+        if self._children:
+            self._detach(list(self._children))
+            list.clear(self._children)
+        _set_slot(self, "_positions", None)
+        self._load(element, lazy)
+
+    def _load(self, element, lazy):
+        """
+        Load the contents of an lxml element into this new (or cleared)
+        node, see from_xml
+
+        Parameters
+        ----------
+        element : lxml element
+        lazy : bool
+
+        Returns
+        -------
+        None
+        """
+        _set_slot(self, "element", element)
+        _set_slot(self, "tag", element.tag)
+        text = element.text
+        _set_slot(self, "_text", text.strip() if isinstance(text, str) else "")
+        _set_slot(self, "_synced", True)
+        _set_slot(self, "_pending", lazy)
+        if lazy:
+            _set_slot(self, "_lazy", True)
+        else:
+            self._load_children(False)
+
+    def get_element(self):
+        """
+        Return an lxml element with the contents of this node.
+        This is the element the node was loaded from, if the node has not
+        been modified since, otherwise a new element from to_xml.
+        The element a node was loaded from keeps its original whitespace,
+        so the text of its elements can differ from the (stripped) text
+        of the nodes, see search_xpath.
+
+        Returns
+        -------
+        lxml element
+        """
+        if self._synced:
+            return self.element
+        return self.to_xml()
+
+    def _expand(self):
+        """
+        Create the child XMLNodes of a lazy node from the lxml element
+
+        Returns
+        -------
+        None
+        """
+        _set_slot(self, "_pending", False)
+        _set_slot(self, "_positions", None)
+        self._load_children(self._lazy)
+
+    def _load_children(self, lazy):
+        """
+        Create a child XMLNode for each child of the lxml element
+
+        Parameters
+        ----------
+        lazy : bool
+
+        Returns
+        -------
+        None
+        """
+        children = self._children
+        for child_element in self.element:
+            child = XMLNode.__new__(XMLNode)
+            _set_slot(child, "_children", _ChildList(child))
+            _set_slot(child, "_parent", self)
+            child._load(child_element, lazy)
+            list.append(children, child)
+
+    @classmethod
+    def _from_tokens(cls, tokens):
+        """
+        Create an XMLNode tree from the (tag, text, children) tuples
+        stored by RecordCache, the result is the same as loading the
+        element the tuples were made from, without the lxml element.
+
+        Parameters
+        ----------
+        tokens : tuple
+                (tag, text, list of the tokens of the children)
+
+        Returns
+        -------
+        XMLNode
+        """
+        tag, text, children = tokens
+        node = cls.__new__(cls)
+        node._init_fields(tag, text)
+        child_nodes = node._children
+        for child_tokens in children:
+            child = cls._from_tokens(child_tokens)
+            _set_slot(child, "_parent", node)
+            list.append(child_nodes, child)
+        return node
+
+    def add_attr(self, tag, child_object):
+        """
+        Add an XMLNode to this object's attributes, without adding it to
+        the children.
+        If there is already an attribute with this tag, make that
+        attribute a list containing the previous item, and append this child
+        Use add_child to add a child node.
 
         Parameters
         ----------
@@ -653,26 +1940,31 @@ class XMLNode(object):
         -------
         None
         """
-        if tag in self.__dict__:
-            cur_contents = self.__dict__[tag]
+        if self._attrs is None:
+            self._attrs = {}
+        if tag in self._attrs:
+            cur_contents = self._attrs[tag]
             if type(cur_contents) == list:
                 cur_contents.append(child_object)
             else:
-                self.__dict__[tag] = [cur_contents, child_object]
+                self._attrs[tag] = [cur_contents, child_object]
         else:
-            self.__dict__[tag] = child_object
+            self._attrs[tag] = child_object
 
     def to_xml(self):
         """
         Return lxml element version of self
 
+        The element is parsed from the output of to_str with lxml's
+        default parser.  The string is our own well formed output, which
+        parses faster in C than the elements can be built one at a time
+        from python, see tests/benchmark_xml_utils.py.
+
         Returns
         -------
         lxml element
         """
-        str_element = self.to_str()
-        element = string_to_node(str_element)
-        return element
+        return etree.fromstring(self.to_str())
 
     def from_str(self, str_element):
         """
@@ -689,15 +1981,27 @@ class XMLNode(object):
         element = lxml.fromstring(str_element, parser=parser)
         self.from_xml(element)
 
-    def to_str(self):
+    def to_str(self, xml_declaration=False):
         """
         return __str__ representation of self
 
+        Parameters
+        ----------
+        xml_declaration : bool, optional
+                If True, return the document form instead, identical to
+                node_to_string(self.to_xml()).  This is what is saved to disk.
+
         Returns
         -------
         str
         """
-        return self.__str__()
+        if not xml_declaration:
+            return self.__str__()
+
+        parts = ["<?xml version='1.0' encoding='UTF-8'?>\n"]
+        self._render(parts, 0, as_document=True)
+        parts.append("\n")
+        return "".join(parts)
 
     def search_xpath(self, xpath=""):
         """
@@ -714,34 +2018,76 @@ class XMLNode(object):
         -------
         list of matching elements
         """
-        if not xpath:
+        return self._search_steps(parse_xpath(xpath))
+
+    def _search_steps(self, steps):
+        """
+        search_xpath using an xpath that has already been split into
+        steps by parse_xpath
+
+        Parameters
+        ----------
+        steps : tuple
+
+        Returns
+        -------
+        list of matching elements
+        """
+        if not steps:
             return self
 
-        xpath_items = xpath.split("/")
-        if len(xpath_items) == 1:
-            xpath_remainder = ""
-        else:
-            xpath_remainder = "/".join(xpath_items[1:])
-        first_item = xpath_items[0]
+        if self._pending:
+            self._expand()
+        item, tag, index, indexed = steps[0]
+        remainder = steps[1:]
         try:
-            tag, index = split_tag(first_item)
-            results = self.__dict__[tag]
-            if "[" in first_item:
-                first_result = results[index]
-                return first_result.search_xpath(xpath_remainder)
+            results = self._lookup(tag)
+            if indexed:
+                return results[index]._search_steps(remainder)
+            elif type(results) == list:
+                aggregator = []
+                for result in results:
+                    node = result._search_steps(remainder)
+                    if node is not None:
+                        aggregator.append(node)
+                return aggregator
             else:
-                if type(results) == list:
-                    aggregator = []
-                    for result in results:
-                        node = result.search_xpath(xpath_remainder)
-                        if node is not None:
-                            aggregator.append(node)
-                    return aggregator
-                else:
-                    return results.search_xpath(xpath_remainder)
-        except:
+                return results._search_steps(remainder)
+        except (KeyError, IndexError, TypeError, AttributeError):
             return []
 
+    def _match_depth(self, steps):
+        """
+        The number of leading steps that xpath_march can match
+
+        Parameters
+        ----------
+        steps : tuple
+                as returned by parse_xpath
+
+        Returns
+        -------
+        int
+        """
+        node = self
+        for depth, (item, tag, index, indexed) in enumerate(steps):
+            if node._pending:
+                node._expand()
+            try:
+                results = node._lookup(tag)
+                if indexed:
+                    results = results[index]
+            except (KeyError, IndexError, TypeError):
+                return depth
+            if type(results) == list:
+                # repeated elements, every longer xpath returns a
+                # (possibly nested) non empty list
+                return len(steps) if results else depth
+            if not isinstance(results, XMLNode):
+                return depth
+            node = results
+        return len(steps)
+
     def xpath(self, xpath="", as_list=True, as_text=False):
         """
         Convenience function for calling self.xpath but specifying the format
@@ -789,15 +2135,16 @@ class XMLNode(object):
         -------
 
         """
-        xpath_items = xpath.split("/")
-
-        while xpath_items:
-            result = self.xpath("/".join(xpath_items), as_list=as_list)
-            if result:
-                return result
-            xpath_items.pop()
+        steps = parse_xpath(xpath)
+        if not steps:
+            return self.xpath(xpath, as_list=as_list)
 
-        return []
+        depth = self._match_depth(steps)
+        if depth == 0 and steps[0][0] != "":
+            return []
+        if depth == len(steps):
+            return self.xpath(xpath, as_list=as_list)
+        return self.xpath("/".join(step[0] for step in steps[:depth]), as_list=as_list)
 
     def clear_children(self, tag=None):
         """
@@ -908,6 +2255,26 @@ class XMLNode(object):
 
         return count_found
 
+    def replace_strings(self, replacements, regex=False, ignorecase=False):
+        """
+        Apply many replacements to the text of this node and all of its
+        children in a single pass, see replace_strings
+
+        Parameters
+        ----------
+        replacements : dict or StringReplacer
+                {old: new} of the replacements to make
+        regex : bool
+                Treat the keys of replacements as regular expressions
+        ignorecase : bool
+                Flag to match case or not
+
+        Returns
+        -------
+        dict : The number of replacements made for each key
+        """
+        return replace_strings(self, replacements, regex, ignorecase)
+
     def add_child(self, child, index=-1, deepcopy=True):
         """
         Add a child element to this object.
@@ -932,16 +2299,16 @@ class XMLNode(object):
             index += 1
 
         if type(child) == etree._Element:
-            node_str = node_to_string(child, encoding=False)
+            if deepcopy:
+                child_copy = XMLNode(copy.deepcopy(child))
+            else:
+                child_copy = XMLNode(child)
+        elif deepcopy:
+            child_copy = child.copy()
         else:
-            node_str = child.to_str()
-        child_copy = XMLNode(node_str)
+            child_copy = child
 
-        if deepcopy:
-            self.children.insert(index, child_copy)
-        else:
-            self.children.insert(index, child)
-        self.add_attr(child.tag, child)
+        self.children.insert(index, child_copy)
 
     def copy(self):
         """
@@ -951,9 +2318,904 @@ class XMLNode(object):
         -------
         XMLNode
         """
-        node_str = self.to_str()
-        self_copy = XMLNode(node_str)
-        return self_copy
+        return self._clone()
+
+    def _clone(self):
+        """
+        Copy this node and its descendants, without going through lxml.
+        The copy is the same as loading the output of to_xml: the text
+        has no control characters and an element with text has no children.
+
+        Returns
+        -------
+        XMLNode
+        """
+        node = XMLNode.__new__(XMLNode)
+        text = self.text
+        if text:
+            node._init_fields(self.tag, remove_control_characters(text).strip())
+            return node
+        node._init_fields(self.tag, "")
+        children = node._children
+        for child in self._render_children():
+            child_copy = child._clone()
+            _set_slot(child_copy, "_parent", node)
+            list.append(children, child_copy)
+        return node
+
+
+# XMLNode sets its slots with object.__setattr__ to skip the bookkeeping
+# in XMLNode.__setattr__
+_set_slot = object.__setattr__
+_NODE_SLOTS = frozenset(XMLNode.__slots__)
+# the value of the slots that are only set when they are needed
+_SLOT_DEFAULTS = {
+    "_positions": None,
+    "_attrs": None,
+    "element": None,
+    "_lazy": False,
+    "_digest": None,
+    "_synced": False,
+    "_parent": None,
+    "_tag_index": None,
+}
+_NO_CHILDREN = ()
+
+
+class StringReplacer(object):
+    """
+    A set of string replacements compiled into a single regular expression
+    so that all of them are applied in one pass over a string.
+
+    Where several plain string patterns match at the same position the
+    longest one is used.  Replacements are not applied to the output of
+    other replacements.
+
+    Regular expressions that contain groups can not be combined (their
+    group numbers, names and backreferences would clash), those are
+    applied by searching for each expression separately and replacing
+    the leftmost match first, which gives the same result.
+    """
+
+    def __init__(self, replacements, regex=False, ignorecase=False):
+        """
+
+        Parameters
+        ----------
+        replacements : dict or list of (old, new) tuples
+                The strings (or regular expressions) to find and what to
+                replace them with
+        regex : bool
+                Treat the old values as regular expressions.
+                Group references in the new values refer to the groups of
+                that expression.
+        ignorecase : bool
+                Flag to match case or not
+        """
+        if isinstance(replacements, dict):
+            replacements = list(replacements.items())
+        if not regex:
+            # try longer strings first so the longest match wins
+            replacements = sorted(replacements, key=lambda r: -len(r[0]))
+        if any(not old for old, new in replacements):
+            raise ValueError("Replacement patterns can not be empty")
+
+        flags = re.IGNORECASE if ignorecase else 0
+        self.patterns = [old for old, new in replacements]
+        self._replacements = [new for old, new in replacements]
+        self.regex = regex
+        if regex:
+            self._compiled = [re.compile(old, flags) for old in self.patterns]
+            alternatives = self.patterns
+        else:
+            self._compiled = []
+            alternatives = [re.escape(old) for old in self.patterns]
+
+        if any(pattern.groups for pattern in self._compiled):
+            self._pattern = None
+        else:
+            self._pattern = re.compile(
+                "|".join(
+                    "(?P<_r{}>{})".format(i, alternative)
+                    for i, alternative in enumerate(alternatives)
+                ),
+                flags,
+            )
+
+    def replace(self, text, counts=None):
+        """
+        Apply the replacements to a string
+
+        Parameters
+        ----------
+        text : str
+        counts : dict, optional
+                If provided, incremented with the number of replacements
+                made for each pattern
+
+        Returns
+        -------
+        str
+        """
+        if counts is None:
+            counts = {}
+
+        if self._pattern is None:
+            return self._replace_separately(text, counts)
+
+        def _replace(match):
+            i = int(match.lastgroup[2:])
+            pattern = self.patterns[i]
+            counts[pattern] = counts.get(pattern, 0) + 1
+            if self.regex:
+                # match the expression on its own, at the same position of
+                # the whole text, so lookarounds and \g<0> work as in re.sub
+                own_match = self._compiled[i].match(match.string, match.start())
+                return own_match.expand(self._replacements[i])
+            return self._replacements[i]
+
+        return self._pattern.sub(_replace, text)
+
+    def _replace_separately(self, text, counts):
+        """
+        Apply regular expression replacements without combining them,
+        see replace.  The next match of each expression is kept, and the
+        leftmost one (the first expression on a tie) is replaced.
+
+        Parameters
+        ----------
+        text : str
+        counts : dict
+
+        Returns
+        -------
+        str
+        """
+        compiled = self._compiled
+        matches = [pattern.search(text) for pattern in compiled]
+        parts = []
+        position = 0
+        while position <= len(text):
+            best = None
+            for i, match in enumerate(matches):
+                if match is not None and match.start() < position:
+                    match = matches[i] = compiled[i].search(text, position)
+                if match is not None and (
+                    best is None or match.start() < best.start()
+                ):
+                    best = match
+                    best_index = i
+            if best is None:
+                break
+
+            pattern = self.patterns[best_index]
+            counts[pattern] = counts.get(pattern, 0) + 1
+            parts.append(text[position : best.start()])
+            parts.append(best.expand(self._replacements[best_index]))
+            position = best.end()
+            if best.end() == best.start():
+                # an empty match, keep the next character and move past it
+                parts.append(text[position : position + 1])
+                position += 1
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+def replace_strings(node, replacements, regex=False, ignorecase=False):
+    """
+    Make many string replacements in the text of a record in a single pass.
+
+    The replacements are compiled once (pass a StringReplacer to reuse
+    the compiled version across many records), and every text is scanned
+    once for all of them.
+
+    Parameters
+    ----------
+    node : XMLRecord, XMLNode or lxml element
+        For lxml elements the tail text is replaced as well.
+    replacements : dict or StringReplacer
+        {old: new} of the replacements to make
+    regex : bool
+        Treat the keys of replacements as regular expressions
+    ignorecase : bool
+        Flag to match case or not
+
+    Returns
+    -------
+    dict : The number of replacements made for each key,
+        keys without any matches are included with a count of 0
+    """
+    if not isinstance(replacements, StringReplacer):
+        replacements = StringReplacer(replacements, regex, ignorecase)
+    counts = dict((pattern, 0) for pattern in replacements.patterns)
+
+    if isinstance(node, XMLRecord):
+        node = node._contents
+    if isinstance(node, XMLNode):
+        for child in node._walk():
+            if child.text:
+                text = replacements.replace(child.text, counts)
+                if text != child.text:
+                    child.text = text
+    else:
+        if isinstance(node, etree._ElementTree):
+            node = node.getroot()
+        for child in node.iter():
+            if child.text and isinstance(child.tag, str):
+                child.text = replacements.replace(child.text, counts)
+            if child.tail:
+                child.tail = replacements.replace(child.tail, counts)
+    return counts
+
+
+_PLACEHOLDER = re.compile(r"{(\w+)((?:![rsa])?(?::[^{}]*)?)}")
+
+
+def _placeholder_format(text):
+    """
+    Convert text containing {name} placeholders into a format string,
+    any other braces in the text are kept as is.
+    """
+    parts = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        literal = text[position : match.start()]
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        parts.append(match.group())
+        position = match.end()
+    literal = text[position:]
+    parts.append(literal.replace("{", "{{").replace("}", "}}"))
+    return "".join(parts)
+
+
+def _iter_rows(rows):
+    """
+    Iterate over the rows of a dataframe, or an iterable of dicts, as dicts
+    """
+    if pd is not None and isinstance(rows, pd.DataFrame):
+        columns = list(rows.columns)
+        for values in rows.itertuples(index=False, name=None):
+            yield dict(zip(columns, values))
+    else:
+        for row in rows:
+            yield row
+
+
+class RecordTemplate(object):
+    """
+    A metadata record with named placeholders, compiled once so that many
+    records can be rendered from it without building XMLNodes for each.
+
+    Placeholders are written as {name} (or {name:format_spec}) in the text
+    of the template, or supplied for the elements at given xpaths.  The
+    template is rendered to the same text XMLRecord.save would write
+    and split into static chunks around the placeholder elements,
+    rendering a record only formats the placeholder elements and joins
+    the chunks.
+    """
+
+    def __init__(self, template, fields=None):
+        """
+
+        Parameters
+        ----------
+        template : XMLRecord, XMLNode, lxml element, file name or xml string
+                The template record, it is not modified
+        fields : dict, optional
+                {xpath: value} where xpath is relative to the root of the
+                template (see XMLNode.xpath), and value is a format string
+                e.g. '{StakeNo}' or a function that takes the row (a dict)
+                and returns the text for the element(s) at that xpath.
+                Functions have to be defined at module level to render
+                records with multiple processes.
+        """
+        root = _as_xmlnode(template).copy()
+
+        values = collections.OrderedDict()
+        for node in root._walk():
+            if node.text and _PLACEHOLDER.search(node.text):
+                values[id(node)] = (node, _placeholder_format(node.text))
+        for xpath, value in (fields or {}).items():
+            nodes = _flatten(root.xpath(xpath))
+            if not nodes:
+                raise ValueError("{} was not found in the template".format(xpath))
+            for node in nodes:
+                values[id(node)] = (node, value)
+
+        # render the template with a unique marker in place of the text of
+        # each placeholder element, and split it up around those elements
+        marker = "pymdwizardslot{}".format(uuid.uuid4().hex)
+        slot_values = []
+        for i, (node, value) in enumerate(values.values()):
+            node.text = "{}{}{}".format(marker, i, marker)
+            slot_values.append(value)
+        document = root.to_str(xml_declaration=True)
+
+        slot_pattern = re.compile(
+            r"( *)<([^<>\s]+)>{0}(\d+){0}</\2>".format(marker)
+        )
+        self._chunks = []
+        self._slots = []
+        position = 0
+        for match in slot_pattern.finditer(document):
+            self._chunks.append(document[position : match.start()])
+            indent, tag, i = match.groups()
+            self._slots.append((indent, tag, slot_values[int(i)]))
+            position = match.end()
+        self._chunks.append(document[position:])
+
+        self.placeholders = set()
+        for value in slot_values:
+            if isinstance(value, str):
+                self.placeholders.update(
+                    match.group(1) for match in _PLACEHOLDER.finditer(value)
+                )
+
+    def render(self, row):
+        """
+        Render the record for one row
+
+        Parameters
+        ----------
+        row : dict
+                placeholder name: value
+
+        Returns
+        -------
+        str : The contents of the xml file
+        """
+        parts = []
+        for chunk, (indent, tag, value) in zip(self._chunks, self._slots):
+            parts.append(chunk)
+            if isinstance(value, str):
+                text = value.format_map(row)
+            else:
+                text = str(value(row))
+            if not text:
+                # rendered like an XMLNode with empty text
+                parts.append("{0}<{1}>\n{0}</{1}>".format(indent, tag))
+                continue
+            text = _escape_text(remove_control_characters(text))
+            if text:
+                parts.append("{0}<{1}>{2}</{1}>".format(indent, tag, text))
+            else:
+                parts.append("{}<{}/>".format(indent, tag))
+        parts.append(self._chunks[-1])
+        return "".join(parts)
+
+    def render_all(self, rows):
+        """
+        Render a record for each row, one at a time
+
+        Parameters
+        ----------
+        rows : pandas dataframe or iterable of dicts
+
+        Returns
+        -------
+        generator of str
+        """
+        for row in _iter_rows(rows):
+            yield self.render(row)
+
+    def save(self, row, fname):
+        """
+        Render the record for one row and write it to a file
+
+        Parameters
+        ----------
+        row : dict
+        fname : str
+                The file name, can contain placeholders, e.g. 'out/{StakeNo}.xml'
+
+        Returns
+        -------
+        str : the name of the file written
+        """
+        fname = fname.format_map(row)
+        with open(fname, "w", encoding="utf-8", newline="") as f:
+            f.write(self.render(row))
+        return fname
+
+    def save_all(self, rows, fname, processes=1, chunksize=64):
+        """
+        Render and write a record for each row, optionally using a pool of
+        processes, see iter_save_all
+
+        Parameters
+        ----------
+        rows : pandas dataframe or iterable of dicts
+        fname : str
+                The file name of each record, with placeholders,
+                e.g. 'out/Stake-{StakeNo}-Metadata.xml'
+        processes : int, optional
+                The number of processes to use, None uses one per cpu
+        chunksize : int, optional
+                The number of rows sent to a process at a time
+
+        Returns
+        -------
+        list of str : the names of the files written, in row order
+        """
+        return list(self.iter_save_all(rows, fname, processes, chunksize))
+
+    def iter_save_all(self, rows, fname, processes=1, chunksize=64):
+        """
+        Render and write a record for each row as the result is iterated
+        over, optionally using a pool of processes.  Rows are read from the
+        input as they are needed, so large inputs can be streamed.
+
+        Parameters
+        ----------
+        rows : pandas dataframe or iterable of dicts
+        fname : str
+                The file name of each record, with placeholders,
+                e.g. 'out/Stake-{StakeNo}-Metadata.xml'
+        processes : int, optional
+                The number of processes to use, None uses one per cpu
+        chunksize : int, optional
+                The number of rows sent to a process at a time
+
+        Returns
+        -------
+        generator of str : the names of the files written, in row order
+        """
+        rows = _iter_rows(rows)
+        if processes == 1:
+            for row in rows:
+                yield self.save(row, fname)
+        else:
+            pool = multiprocessing.Pool(
+                processes, initializer=_set_pool_template, initargs=(self, fname)
+            )
+            try:
+                for result in pool.imap(_save_pool_row, rows, chunksize=chunksize):
+                    yield result
+            finally:
+                pool.terminate()
+
+
+_POOL_TEMPLATE = None
+
+
+def _set_pool_template(template, fname):
+    global _POOL_TEMPLATE
+    _POOL_TEMPLATE = (template, fname)
+
+
+def _save_pool_row(row):
+    template, fname = _POOL_TEMPLATE
+    return template.save(row, fname)
+
+
+def _flatten(items):
+    """
+    Flatten the (possibly nested) lists returned by XMLNode.xpath
+    """
+    flat = []
+    for item in items:
+        if isinstance(item, list):
+            flat.extend(_flatten(item))
+        else:
+            flat.append(item)
+    return flat
+
+
+def _element_tokens(element):
+    """
+    The (tag, text, children) tuples that XMLNode._from_tokens uses to
+    recreate the XMLNode of an lxml element
+    """
+    try:
+        text = element.text.strip()
+    except:
+        text = ""
+    return (
+        element.tag,
+        text,
+        [_element_tokens(child) for child in element],
+    )
+
+
+_CACHE_SUFFIX = ".marshal"
+
+
+def _private_dir(dname):
+    """
+    Create a directory that only the current user can access, or check
+    that an existing one is owned by the current user and not accessible
+    to anyone else
+
+    Parameters
+    ----------
+    dname : str
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    OSError if the directory exists and is not private
+    """
+    os.makedirs(dname, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        # windows, the temp directory is already per user
+        return
+    stat = os.lstat(dname)
+    if (
+        os.path.islink(dname)
+        or stat.st_uid != os.getuid()
+        or stat.st_mode & 0o077
+    ):
+        raise OSError(
+            "{} is not a directory private to the current user".format(dname)
+        )
+
+
+class RecordCache(object):
+    """
+    On disk cache of parsed records, stored as nested tuples in marshal
+    format which load much faster than the xml can be parsed into
+    XMLNodes.  Unlike pickle, loading marshal data can not run code.
+
+    Entries are keyed by the path, modification time and size of the
+    file, so a changed file is parsed again.  When the cache grows past
+    max_bytes the least recently used entries are removed.  The size of
+    the cache is counted when it is first written to and then kept up to
+    date by put, entries written by other processes are only counted the
+    next time the cache is evicted.
+    """
+
+    # the fraction of max_bytes left after put evicts entries, so that the
+    # next puts do not list the directory again
+    evict_fraction = 0.9
+
+    def __init__(self, dname=None, max_bytes=256 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        dname : str, optional
+                The directory to store the cache in, it is created if it
+                does not exist.  Defaults to a directory in the temp
+                directory that only the current user can access.
+        max_bytes : int, optional
+                The maximum total size of the cache files
+
+        Raises
+        ------
+        OSError if the default directory exists but is owned by another
+        user or can be accessed by other users
+        """
+        if dname is None:
+            name = "pymdwizard_record_cache"
+            if hasattr(os, "getuid"):
+                name = "{}_{}".format(name, os.getuid())
+            dname = os.path.join(tempfile.gettempdir(), name)
+            _private_dir(dname)
+        else:
+            os.makedirs(dname, mode=0o700, exist_ok=True)
+        self.dname = dname
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def _entry_fname(self, fname):
+        stat = os.stat(fname)
+        key = "{}|{}|{}".format(os.path.abspath(fname), stat.st_mtime_ns, stat.st_size)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.dname, digest + _CACHE_SUFFIX)
+
+    def get(self, fname):
+        """
+        Return the cached contents of a file, or None if it is not cached
+        or has changed since it was
+
+        Parameters
+        ----------
+        fname : str
+
+        Returns
+        -------
+        tuple or None
+        """
+        try:
+            entry_fname = self._entry_fname(fname)
+            with open(entry_fname, "rb") as f:
+                tokens = marshal.load(f)
+            # mark as recently used
+            os.utime(entry_fname)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(tokens, tuple) or len(tokens) != 3:
+            return None
+        return tokens
+
+    def put(self, fname, element):
+        """
+        Store the contents of a file
+
+        Parameters
+        ----------
+        fname : str
+        element : lxml element
+                the parsed root element of the file
+
+        Returns
+        -------
+        None
+        """
+        try:
+            data = marshal.dumps(_element_tokens(element))
+        except ValueError:
+            # comments and processing instructions do not have a str tag
+            return
+        entry_fname = self._entry_fname(fname)
+        temp_fname = "{}.{}.tmp".format(entry_fname, uuid.uuid4().hex)
+        with open(temp_fname, "wb") as f:
+            f.write(data)
+        if self._size is not None:
+            try:
+                self._size -= os.path.getsize(entry_fname)
+            except OSError:
+                pass
+            self._size += len(data)
+        os.replace(temp_fname, entry_fname)
+        if self._size is None:
+            self.evict()
+        elif self._size > self.max_bytes:
+            self.evict(int(self.max_bytes * self.evict_fraction))
+
+    def evict(self, max_bytes=None):
+        """
+        Remove the least recently used entries until the cache is no larger
+        than max_bytes
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+                The size to reduce the cache to, defaults to self.max_bytes
+
+        Returns
+        -------
+        None
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = []
+        for entry in os.scandir(self.dname):
+            if entry.name.endswith(_CACHE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+
+        Returns
+        -------
+        None
+        """
+        self.evict(0)
+
+
+_RECORD_CACHE = None
+
+
+def get_record_cache():
+    """
+    Return the default RecordCache
+
+    Returns
+    -------
+    RecordCache
+    """
+    global _RECORD_CACHE
+    if _RECORD_CACHE is None:
+        _RECORD_CACHE = RecordCache()
+    return _RECORD_CACHE
+
+
+def dedup_nodes(nodes):
+    """
+    Remove duplicate nodes from a list, keeping the first occurrence.
+    Nodes are compared by their content digest, see XMLNode.digest
+
+    Parameters
+    ----------
+    nodes : list of XMLNodes
+
+    Returns
+    -------
+    list of XMLNodes
+    """
+    unique = {}
+    for node in nodes:
+        unique.setdefault(node.digest(), node)
+    return list(unique.values())
+
+
+NodeChange = collections.namedtuple(
+    "NodeChange", ["change", "old_xpath", "new_xpath", "old_text", "new_text"]
+)
+
+
+def _as_xmlnode(contents):
+    """
+    Return the root XMLNode of an XMLRecord, XMLNode, lxml element or
+    anything xml_document_loader accepts.
+    """
+    if isinstance(contents, XMLNode):
+        return contents
+    if isinstance(contents, XMLRecord):
+        return contents._contents
+
+    element = xml_document_loader(contents)
+    if isinstance(element, etree._ElementTree):
+        element = element.getroot()
+    return XMLNode(element)
+
+
+def _child_xpaths(parent_xpath, children):
+    """
+    The xpath of each child, an index is only included for tags
+    that are repeated, e.g. 'attr[3]'
+    """
+    tag_counts = collections.Counter(child.tag for child in children)
+    tag_seen = collections.Counter()
+    xpaths = []
+    for child in children:
+        tag_seen[child.tag] += 1
+        if tag_counts[child.tag] > 1:
+            xpaths.append(
+                "{}/{}[{}]".format(parent_xpath, child.tag, tag_seen[child.tag])
+            )
+        else:
+            xpaths.append("{}/{}".format(parent_xpath, child.tag))
+    return xpaths
+
+
+def _longest_increasing(values):
+    """
+    Return the set of positions of a longest strictly increasing
+    subsequence of values.
+    """
+    tails, tail_positions = [], []
+    previous = [None] * len(values)
+    for i, value in enumerate(values):
+        j = bisect.bisect_left(tails, value)
+        if j == len(tails):
+            tails.append(value)
+            tail_positions.append(i)
+        else:
+            tails[j] = value
+            tail_positions[j] = i
+        previous[i] = tail_positions[j - 1] if j else None
+
+    keep = set()
+    i = tail_positions[-1] if tail_positions else None
+    while i is not None:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+def _diff_subtree(old, new, old_xpath, new_xpath, changes):
+    if old.digest() == new.digest():
+        return
+
+    if old.text or new.text:
+        changes.append(NodeChange("text", old_xpath, new_xpath, old.text, new.text))
+        if old.text:
+            old_children = []
+        else:
+            old_children = list(old._render_children())
+        if new.text:
+            new_children = []
+        else:
+            new_children = list(new._render_children())
+        for xpath, child in zip(_child_xpaths(old_xpath, old_children), old_children):
+            changes.append(NodeChange("deleted", xpath, None, child.text, None))
+        for xpath, child in zip(_child_xpaths(new_xpath, new_children), new_children):
+            changes.append(NodeChange("inserted", None, xpath, None, child.text))
+        return
+
+    old_children = list(old._render_children())
+    new_children = list(new._render_children())
+    old_xpaths = _child_xpaths(old_xpath, old_children)
+    new_xpaths = _child_xpaths(new_xpath, new_children)
+
+    # pair up identical children, in order, using their digests
+    unmatched_old = collections.defaultdict(collections.deque)
+    for i, child in enumerate(old_children):
+        unmatched_old[child.digest()].append(i)
+    identical = []
+    new_matched = set()
+    for j, child in enumerate(new_children):
+        candidates = unmatched_old.get(child.digest())
+        if candidates:
+            identical.append((candidates.popleft(), j))
+            new_matched.add(j)
+    old_matched = set(i for i, j in identical)
+
+    # identical children that are out of order relative to the others moved
+    in_order = _longest_increasing([i for i, j in identical])
+    for position, (i, j) in enumerate(identical):
+        if position not in in_order:
+            changes.append(
+                NodeChange("moved", old_xpaths[i], new_xpaths[j], None, None)
+            )
+
+    # pair up the remaining children by tag, in order, and compare those
+    remaining_old = collections.defaultdict(collections.deque)
+    for i, child in enumerate(old_children):
+        if i not in old_matched:
+            remaining_old[child.tag].append(i)
+    for j, child in enumerate(new_children):
+        if j in new_matched:
+            continue
+        candidates = remaining_old.get(child.tag)
+        if candidates:
+            i = candidates.popleft()
+            old_matched.add(i)
+            _diff_subtree(old_children[i], child, old_xpaths[i], new_xpaths[j], changes)
+        else:
+            changes.append(NodeChange("inserted", None, new_xpaths[j], None, child.text))
+
+    for i, child in enumerate(old_children):
+        if i not in old_matched:
+            changes.append(NodeChange("deleted", old_xpaths[i], None, child.text, None))
+
+
+def diff_nodes(old, new, as_dataframe=False):
+    """
+    Compute the structural differences between two records or nodes.
+
+    Identical subtrees are skipped by comparing their content digests
+    (see XMLNode.digest), so only the changed parts of the records are
+    walked.  Children are matched to each other by their contents first,
+    then in order by tag.  Moves are only detected among siblings,
+    an element that moved to a different parent is reported as
+    deleted and inserted.
+
+    Parameters
+    ----------
+    old : XMLRecord, XMLNode, lxml element, file name or xml string
+    new : XMLRecord, XMLNode, lxml element, file name or xml string
+    as_dataframe : bool
+            used to specify return format (list of NodeChange or dataframe)
+
+    Returns
+    -------
+        list of NodeChange namedtuples
+        (change, old_xpath, new_xpath, old_text, new_text)
+        where change is one of 'inserted', 'deleted', 'moved' or 'text'
+        or
+        pandas dataframe
+    """
+    old = _as_xmlnode(old)
+    new = _as_xmlnode(new)
+
+    changes = []
+    if old.tag == new.tag:
+        _diff_subtree(old, new, str(old.tag), str(new.tag), changes)
+    else:
+        changes.append(NodeChange("deleted", str(old.tag), None, old.text, None))
+        changes.append(NodeChange("inserted", None, str(new.tag), None, new.text))
+
+    if as_dataframe:
+        return pd.DataFrame.from_records(changes, columns=NodeChange._fields)
+    else:
+        return changes
 
 
 def split_tag(tag):
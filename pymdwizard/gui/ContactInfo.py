@@ -104,7 +104,7 @@ class ContactInfo(WizardWidget):
 
         try:
             cntperp = utils.get_usgs_contact_info(username, as_dictionary=False)
-            if cntperp.getchildren()[0].getchildren()[0].text.strip():
+            if cntperp[0][0].text.strip():
                 self.from_xml(cntperp)
                 self.usgs_contact.deleteLater()
             else:
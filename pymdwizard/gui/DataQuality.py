@@ -120,7 +120,7 @@ class DataQuality(WizardWidget):
             srcinfo_node = self.sourceinput.to_xml()
 
         procstep_node = self.procstep.to_xml()
-        procstep_children = procstep_node.getchildren()
+        procstep_children = list(procstep_node)
 
         for i in procstep_children:
             srcinfo_node.append(i)
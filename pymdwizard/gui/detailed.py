@@ -112,7 +112,7 @@ class Detailed(WizardWidget):  #
 
         filter = "data files (*.csv *.txt *.shp *.xls *.xlsm *.xlsx "
         filter += "*.tif *.grd *.png *.img *.jpg *.hdr *.bmp *.adf "
-        filter += "*.las *.laz)"
+        filter += "*.las *.laz *.parquet *.feather)"
 
         fname = QFileDialog.getOpenFileName(self, fname, dname, filter=filter)
         if fname[0]:
@@ -296,16 +296,27 @@ class Detailed(WizardWidget):  #
                 self.attributes.load_pickle(p)
         elif ext.lower() == ".txt":
             if sheet_name is None:
-                delimiters = {"comma": ",", "tab": "\t", "pipe": "|", "colon": ":"}
-
-                delimiter_str, ok = QInputDialog.getItem(
-                    self,
-                    "Select text delimiter",
-                    "Pick the delimiter used in this file",
-                    delimiters.keys(),
-                    0,
-                    False,
-                )
+                delimiters = {
+                    "comma": ",",
+                    "tab": "\t",
+                    "pipe": "|",
+                    "colon": ":",
+                    "semicolon": ";",
+                }
+
+                sniffed = data_io.sniff_csv(fname, default_delimiter=None)
+                names = {v: k for k, v in delimiters.items()}
+                if sniffed.delimiter in names:
+                    delimiter_str, ok = names[sniffed.delimiter], True
+                else:
+                    delimiter_str, ok = QInputDialog.getItem(
+                        self,
+                        "Select text delimiter",
+                        "Pick the delimiter used in this file",
+                        delimiters.keys(),
+                        0,
+                        False,
+                    )
 
                 delimiter = delimiters[delimiter_str]
 
@@ -328,6 +339,15 @@ class Detailed(WizardWidget):  #
                     )
                     QMessageBox.warning(self, "File load problem", msg)
         
+        elif ext.lower() in [".parquet", ".feather"]:
+            self.clear_widget()
+            self.ui.fgdc_enttypl.setText(shortname)
+            self.ui.fgdc_enttypd.setPlainText(
+                "Apache {} file containing data.".format(ext[1:].capitalize())
+            )
+
+            df = data_io.read_data(fname)
+            self.attributes.load_df(df)
         elif ext.lower() in [".las", ".laz"]:
             self.clear_widget()
             self.ui.fgdc_enttypl.setText(shortname)
@@ -338,7 +358,7 @@ class Detailed(WizardWidget):  #
             df = data_io.read_data(fname)
             self.attributes.load_df(df)
         else:
-            msg = "Can only read '.csv', '.txt', '.shp', '.las.', raster files, and Excel files here"
+            msg = "Can only read '.csv', '.txt', '.shp', '.las.', '.parquet', '.feather', raster files, and Excel files here"
             QMessageBox.warning(self, "Unsupported file format", msg)
 
     def clear_widget(self):
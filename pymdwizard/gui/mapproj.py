@@ -48,6 +48,8 @@ the copyright owner.
 ------------------------------------------------------------------------------
 """
 
+from collections import ChainMap
+
 from PyQt5.QtWidgets import QLineEdit
 from PyQt5.QtWidgets import QLabel
 
@@ -92,12 +94,16 @@ class MapProj(WizardWidget):
         self.shortname = shortname
         self.projection = spatial_utils.lookup_shortname(shortname)
 
-        annotation_lookup = fgdc_utils.get_fgdc_lookup()
-
-        annotation_lookup["stdparll_2"] = {
-            "long_name": "Standard Parallel",
-            "annotation": annotation_lookup["stdparll"]["annotation"],
-        }
+        fgdc_lookup = fgdc_utils.get_fgdc_lookup()
+        annotation_lookup = ChainMap(
+            {
+                "stdparll_2": {
+                    "long_name": "Standard Parallel",
+                    "annotation": fgdc_lookup.annotation("stdparll"),
+                }
+            },
+            fgdc_lookup,
+        )
 
         self.clear_widget()
         layout = self.ui.mapproj_contents.layout()
@@ -140,7 +146,7 @@ class MapProj(WizardWidget):
         shortname = mapproj_node.tag
         self.load_projection(shortname)
 
-        for item in mapproj_node.getchildren():
+        for item in mapproj_node:
             tag = item.tag
             item_widget = self.findChild(QLineEdit, "fgdc_" + tag)
             utils.set_text(item_widget, item.text)
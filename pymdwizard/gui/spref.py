@@ -328,7 +328,7 @@ class SpRef(WizardWidget):
                     utils.populate_widget_element(
                         self.ui.fgdc_mapprojn, mapproj, "mapprojn"
                     )
-                    mapproj_children = mapproj.getchildren()
+                    mapproj_children = list(mapproj)
                     if len(mapproj_children) > 1:
                         self.mapproj.from_xml(mapproj_children[1])
 
@@ -340,19 +340,19 @@ class SpRef(WizardWidget):
                         self.ui.fgdc_gridsysn, gridsys, "gridsysn"
                     )
 
-                    gridsys_children = gridsys.getchildren()
+                    gridsys_children = list(gridsys)
                     if len(gridsys_children) > 1:
-                        gridsys_contents = gridsys.getchildren()[1]
+                        gridsys_contents = gridsys[1]
                     else:
                         gridsys_contents = []
-                    for item in gridsys_contents.getchildren():
+                    for item in gridsys_contents:
                         tag = item.tag
                         if spatial_utils.lookup_shortname(tag) is not None:
                             self.grid_mapproj.from_xml(item)
                         elif tag == "mapproj":
                             mapprojn = xml_utils.search_xpath(item, "mapprojn")
                             if mapprojn.text in spatial_utils.PROJECTION_LOOKUP:
-                                self.grid_mapproj.from_xml(item.getchildren()[1])
+                                self.grid_mapproj.from_xml(item[1])
                         else:
                             item_widget = self.findChild(QLineEdit, "fgdc_" + tag)
                             utils.set_text(item_widget, item.text)
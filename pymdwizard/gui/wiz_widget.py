@@ -248,7 +248,7 @@ class WizardWidget(QWidget):
                 child_node = xml_utils.XMLNode(tag=widget_name.replace("fgdc_", ""))
                 child_node.widget = child_widget
                 self.add_children(child_widget, child_node)
-                parent_node.add_child(child_node)
+                parent_node.add_child(child_node, deepcopy=False)
             else:
                 self.add_children(child_widget, parent_node)
         return parent_node
@@ -0,0 +1,87 @@
+"""Benchmarks for core.xml_utils
+
+Times XMLNode.to_xml, copy and add_child against the string round trip
+they used before (serialize with to_str, then parse the string again with
+string_to_node's recovering parser), on a large record.
+
+Run from the repository root with:
+    python -m tests.benchmark_xml_utils [number of attr copies]
+"""
+
+
+import sys
+import timeit
+
+from lxml import etree
+
+from pymdwizard.core import xml_utils
+
+
+def make_record(copies=3000):
+    """
+    The polar bear record with copies more attributes in its entity
+    and attribute section
+    """
+    md = xml_utils.XMLRecord("tests/data/USGS_ASC_PolarBears_FGDC.xml")
+    detailed = md.metadata.eainfo.detailed
+    attrs = detailed.attr
+    for i in range(copies):
+        detailed.add_child(attrs[i % len(attrs)])
+    return md
+
+
+def old_to_xml(node):
+    return xml_utils.string_to_node(node.to_str())
+
+
+def old_copy(node):
+    return xml_utils.XMLNode(node.to_str())
+
+
+def old_add_child(node, child):
+    node.add_child(xml_utils.XMLNode(child.to_str()), deepcopy=False)
+
+
+def add_origins(node, add, count=50):
+    citeinfo = node.idinfo.citation.citeinfo
+    origin = xml_utils.XMLNode(tag="origin", text="A. Author")
+    for i in range(count):
+        add(citeinfo, origin)
+    citeinfo.clear_children("origin")
+
+
+def best(function, number=3):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def main(copies=3000):
+    md = make_record(copies)
+    node = md.metadata
+    print("record with {} elements".format(len(list(node.to_xml().iter()))))
+
+    # the new paths give the same output as the round trip
+    assert etree.tostring(node.to_xml()) == etree.tostring(old_to_xml(node))
+    assert node.copy().to_str() == old_copy(node).to_str()
+
+    results = [
+        ("to_xml", lambda: old_to_xml(node), node.to_xml),
+        ("copy", lambda: old_copy(node), node.copy),
+        (
+            "add_child x50",
+            lambda: add_origins(node, old_add_child),
+            lambda: add_origins(node, lambda parent, child: parent.add_child(child)),
+        ),
+    ]
+    print("{:<16}{:>12}{:>12}{:>10}".format("", "round trip", "new", "speedup"))
+    for name, old, new in results:
+        old_time = best(old)
+        new_time = best(new)
+        print(
+            "{:<16}{:>11.4f}s{:>11.4f}s{:>9.1f}x".format(
+                name, old_time, new_time, old_time / new_time
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,59 @@
+"""Unittests for core.batch_utils"""
+
+
+import pytest
+
+from pymdwizard.core import batch_utils
+
+
+def test_validate_files(tmp_path):
+    cache_fname = str(tmp_path / "cache.sqlite")
+    results = dict(
+        batch_utils.validate_files("tests/data", processes=1, cache_fname=cache_fname)
+    )
+    assert len(results) == 6
+    polar_bears = [r for r in results if r.endswith("USGS_ASC_PolarBears_FGDC.xml")]
+    assert len(results[polar_bears[0]]) == 3
+
+
+def test_validate_files_cache(tmp_path, monkeypatch):
+    cache_fname = str(tmp_path / "cache.sqlite")
+    first = dict(
+        batch_utils.validate_files("tests/data", processes=1, cache_fname=cache_fname)
+    )
+
+    def fail(job):
+        raise AssertionError("cached file was validated again")
+
+    monkeypatch.setattr(batch_utils, "_validate_job", fail)
+    second = dict(
+        batch_utils.validate_files("tests/data", processes=1, cache_fname=cache_fname)
+    )
+    assert first == second
+
+
+def test_validate_files_vanished(tmp_path, monkeypatch):
+    # a file removed between being listed and being hashed
+    missing = str(tmp_path / "missing.xml")
+    polar_bears = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    monkeypatch.setattr(
+        batch_utils.xml_utils,
+        "find_xml_files",
+        lambda locator, recursive=True: [missing, polar_bears],
+    )
+    results = dict(
+        batch_utils.validate_files(
+            "tests/data", processes=1, cache_fname=str(tmp_path / "cache.sqlite")
+        )
+    )
+    assert results[missing][0][1].startswith("Could not read file")
+    assert len(results[polar_bears]) == 3
+
+
+def test_write_results(tmp_path):
+    results = list(batch_utils.validate_files("tests/data/*.xml", processes=2))
+    assert batch_utils.write_csv(results, str(tmp_path / "out.csv")) == 3
+    assert batch_utils.write_jsonl(results, str(tmp_path / "out.jsonl")) == 3
+    df = batch_utils.results_to_dataframe(results)
+    assert list(df.columns) == batch_utils.RESULT_COLUMNS
+    assert df["fname"].nunique() == 3
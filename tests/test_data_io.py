@@ -1,6 +1,11 @@
 """Unittests for core.data_io"""
 
 
+import struct
+import decimal
+import datetime
+import warnings
+
 import pytest
 
 import pandas as pd
@@ -19,3 +24,224 @@ def test_read_csv():
         u"petal_width",
         u"species",
     ]
+
+
+def test_profile_data(tmp_path):
+    fname = "tests/data/iris.csv"
+    df = pymdwizard.core.data_io.read_csv(fname)
+    profiles = pymdwizard.core.data_io.profile_data(fname, chunksize=40)
+    assert list(profiles) == list(df.columns)
+    for column, profile in profiles.items():
+        assert profile.count == 150
+        assert profile.min == df[column].min()
+        assert profile.max == df[column].max()
+        assert profile.distinct == set(df[column].unique())
+    assert not profiles["species"].numeric
+
+    fname = str(tmp_path / "nodata.csv")
+    pd.DataFrame(
+        {"value": list(range(250)) + [-9999] * 5, "code": ["", "a", "b"] * 85}
+    ).to_csv(fname, index=False)
+    profiles = pymdwizard.core.data_io.profile_data(
+        fname, chunksize=100, max_distinct=100, as_dataframe=True
+    ).set_index("name")
+    assert profiles.loc["value", "min"] == 0
+    assert profiles.loc["value", "max"] == 249
+    assert profiles.loc["value", "nodata_counts"] == {-9999: 5}
+    assert pd.isnull(profiles.loc["value", "distinct_count"])
+    assert abs(profiles.loc["value", "approx_distinct"] - 250) < 10
+    assert profiles.loc["code", "nodata_counts"] == {"": 85}
+    assert profiles.loc["code", "distinct_count"] == 2
+
+
+def test_profile_data_encodings(monkeypatch):
+    # only text files are read again with another encoding
+    encodings = []
+
+    def fail(fname, sheet_name, delimiter, chunksize, encoding, columns):
+        encodings.append(encoding)
+        raise UnicodeDecodeError("utf-8", b"\xe9", 0, 1, "invalid")
+        yield
+
+    monkeypatch.setattr(pymdwizard.core.data_io, "iter_chunks", fail)
+    for fname, expected in [("data.csv", [None, "ISO-8859-1"]), ("data.dbf", [None])]:
+        del encodings[:]
+        with pytest.raises(UnicodeDecodeError):
+            pymdwizard.core.data_io.profile_data(fname)
+        assert encodings == expected
+
+
+def test_sniff_csv(tmp_path):
+    df = pymdwizard.core.data_io.read_csv("tests/data/iris.csv")
+    df.loc[0, "species"] = "séto"
+
+    fname = str(tmp_path / "latin.txt")
+    df.to_csv(fname, sep="\t", index=False, encoding="latin-1")
+    csv_format = pymdwizard.core.data_io.sniff_csv(fname)
+    assert csv_format == ("cp1252", "\t")
+    assert pymdwizard.core.data_io.read_data(fname).species[0] == "séto"
+
+    fname = str(tmp_path / "bom.csv")
+    df.to_csv(fname, sep=";", index=False, encoding="utf-8-sig")
+    assert pymdwizard.core.data_io.sniff_csv(fname) == ("utf-8-sig", ";")
+    result = pymdwizard.core.data_io.read_data(fname)
+    assert list(result.columns) == list(df.columns)
+
+    fname = str(tmp_path / "deep.csv")
+    with open(fname, "wb") as f:
+        f.write(b"a,b\n" + b"1,x\n" * 20000 + b"2,\xe9\n")
+    csv_format = pymdwizard.core.data_io.sniff_csv(fname, sample_size=1024)
+    assert csv_format.encoding == "cp1252"
+    assert pymdwizard.core.data_io.read_csv(fname).b.iloc[-1] == "é"
+
+
+def test_read_arrow(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pymdwizard.core.data_io.read_csv("tests/data/iris.csv")
+    assert pymdwizard.core.data_io.read_csv(
+        "tests/data/iris.csv", engine="pyarrow"
+    ).equals(df)
+    result = pymdwizard.core.data_io.read_csv(
+        "tests/data/iris_comments.csv", engine="pyarrow"
+    )
+    assert result.shape[0] == 150
+
+    fname = str(tmp_path / "iris.parquet")
+    df.to_parquet(fname, row_group_size=30)
+    result = pymdwizard.core.data_io.read_data(fname, columns=["species"])
+    assert list(result.columns) == ["species"]
+    assert result.species.equals(df.species)
+    result = pymdwizard.core.data_io.read_parquet(fname, row_groups=2)
+    assert result.shape == (60, 5)
+    assert result.sepal_length.iloc[30] == df.sepal_length.iloc[120]
+
+    fname = str(tmp_path / "iris.feather")
+    df.to_feather(fname)
+    result = pymdwizard.core.data_io.read_data(fname, columns=["sepal_width"])
+    assert result.sepal_width.equals(df.sepal_width)
+
+
+def test_profile_parquet_metadata(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {
+            "code": ["a", "b", "NA", "c"] * 250,
+            "value": [-9999] + list(range(999)),
+            "count": list(range(1000)),
+        }
+    )
+    fname = str(tmp_path / "data.parquet")
+    df.to_parquet(fname, row_group_size=300)
+
+    profiles = pymdwizard.core.data_io.profile_data(
+        fname, max_distinct=100, metadata_only=True
+    )
+    scanned = pymdwizard.core.data_io.profile_data(fname, max_distinct=100)
+    assert profiles["code"].distinct == scanned["code"].distinct == {"a", "b", "c"}
+    assert profiles["code"].nodata_counts == {"NA": None}
+    assert profiles["code"].min == "a"
+
+    # too many distinct values, the range comes from the footer statistics
+    assert profiles["value"].distinct_count is None
+    assert profiles["value"].nodata_counts == {-9999: None}
+    assert (profiles["value"].min, profiles["value"].max) == (-9999, 998)
+    assert profiles["count"].count == 1000
+    assert profiles["count"].null_count == 0
+    assert (profiles["count"].min, profiles["count"].max) == (0, 999)
+    assert profiles["count"].distinct is None
+
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table(
+        {
+            "price": pa.array(
+                [decimal.Decimal("1.50"), decimal.Decimal("-2.25")] * 50,
+                pa.decimal128(9, 2),
+            ),
+            "total": pa.array(
+                [decimal.Decimal("100.01"), None] * 50, pa.decimal128(20, 2)
+            ),
+            "code": ["a", "b"] * 50,
+            "when": pa.array(
+                [datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2, 12)] * 50,
+                pa.timestamp("ms"),
+            ),
+        }
+    )
+    for compression in ["lz4", "snappy", "none"]:
+        pq.write_table(table, fname, compression=compression)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            profiles = pymdwizard.core.data_io.profile_data(fname, metadata_only=True)
+        scanned = pymdwizard.core.data_io.profile_data(fname)
+        for name, profile in profiles.items():
+            assert profile.to_dict() == scanned[name].to_dict()
+            assert profile.distinct == scanned[name].distinct
+        assert profiles["price"].numeric
+        assert profiles["price"].distinct_count == 2
+
+    # timestamps are dates, not their epoch numbers
+    for max_distinct in [100, 1]:
+        profiles = pymdwizard.core.data_io.profile_data(
+            fname, max_distinct=max_distinct, metadata_only=True
+        )
+        assert not profiles["when"].to_dict()["numeric"]
+        assert profiles["when"].min == "2020-01-01T00:00:00"
+        assert profiles["when"].max == "2020-01-02T12:00:00"
+
+    # the statistics of text columns might be truncated
+    pq.write_table(table, fname, use_dictionary=False)
+    profiles = pymdwizard.core.data_io.profile_data(fname, metadata_only=True)
+    assert profiles["code"].min is None and profiles["code"].max is None
+    assert profiles["price"].min == -2.25
+
+
+def test_read_dbf(tmp_path):
+    fields = [(b"VALUE", b"N", 6, 0), (b"AREA", b"N", 8, 2), (b"NAME", b"C", 8, 0)]
+    fields += [(b"WHEN", b"D", 8, 0), (b"OK", b"L", 1, 0)]
+    rows = [
+        b"      1   12.50red     20200101T",
+        b"*     2    0.25green   20200102F",
+        b"      3        blue    20200103?",
+    ]
+    fname = str(tmp_path / "test.vat.dbf")
+    with open(fname, "wb") as f:
+        f.write(struct.pack("<BBBBLHH20x", 3, 120, 1, 1, 3, 193, 32))
+        for name, typ, size, deci in fields:
+            f.write(struct.pack("<11sc4xBB14x", name, typ, size, deci))
+        f.write(b"\r" + b"".join(rows))
+
+    df = pymdwizard.core.data_io.read_dbf(fname)
+    assert list(df.columns) == ["VALUE", "AREA", "NAME", "WHEN", "OK"]
+    assert df.VALUE.tolist() == [1, 3]
+    assert df.AREA.iloc[0] == 12.5
+    assert pd.isnull(df.AREA.iloc[1])
+    assert df.NAME.tolist() == ["red", "blue"]
+    assert df.WHEN.iloc[1] == pd.Timestamp("2020-01-03")
+    assert df.OK.iloc[0] and pd.isnull(df.OK.iloc[1])
+
+
+def test_iter_chunks(tmp_path):
+    fname = str(tmp_path / "data.txt.gz")
+    with open(fname, "wb") as f:
+        f.write(b"not a table")
+    with pytest.raises(ValueError):
+        next(pymdwizard.core.data_io.iter_chunks(fname))
+
+    # the same values read as text in one chunk and numbers in another
+    profile = pymdwizard.core.data_io.ColumnProfile("code")
+    profile.update(pd.Series([1, 2, 2.5]))
+    profile.update(pd.Series(["1", "2.5", "x"]))
+    assert profile.distinct_count == 4
+    assert profile.approx_distinct == 4
+
+    pytest.importorskip("openpyxl")
+    df = pymdwizard.core.data_io.read_csv("tests/data/iris.csv")
+    fname = str(tmp_path / "iris.xlsx")
+    df.to_excel(fname, index=False)
+    chunks = list(pymdwizard.core.data_io.iter_chunks(fname, chunksize=40))
+    assert [len(chunk) for chunk in chunks] == [40, 40, 40, 30]
+    result = pd.concat(chunks, ignore_index=True)
+    assert list(result.columns) == list(df.columns)
+    assert result.sepal_length.equals(df.sepal_length)
+    assert result.species.equals(df.species)
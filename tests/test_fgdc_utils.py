@@ -0,0 +1,60 @@
+"""Unittests for core.fgdc_utils"""
+
+
+import threading
+
+import pytest
+
+from pymdwizard.core import fgdc_utils
+
+
+def test_schema_cache():
+    fgdc_utils.clear_schema_cache()
+    fgdc_schema = fgdc_utils.get_schema("fgdc")
+    assert fgdc_utils.get_schema("fgdc") is fgdc_schema
+    assert fgdc_utils.get_schema(fgdc_utils.get_schema_fname("fgdc")) is fgdc_schema
+    assert fgdc_utils.get_schema("bdp") is not fgdc_schema
+
+    other_thread = []
+    thread = threading.Thread(
+        target=lambda: other_thread.append(fgdc_utils.get_schema("fgdc"))
+    )
+    thread.start()
+    thread.join()
+    assert other_thread[0] is not fgdc_schema
+
+    fgdc_utils.clear_schema_cache()
+    assert fgdc_utils.get_schema("fgdc") is not fgdc_schema
+
+
+def test_validate_xml():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    errors = fgdc_utils.validate_xml(fname)
+    assert len(errors) == 3
+    assert errors[0][0] == "metadata/idinfo/spdom/descgeog"
+
+
+def test_validate_xml_in_place():
+    fname = "tests/data/projections/wgs84.shp.xml"
+    errors = fgdc_utils.validate_xml(fname)
+    in_place_errors = fgdc_utils.validate_xml(fname, reparse=False)
+
+    assert [e[:2] for e in errors] == [e[:2] for e in in_place_errors]
+    # the original document is on a single line, a reparse of the pretty
+    # printed version is needed to get distinct line numbers
+    assert {e[2] for e in in_place_errors} == {2}
+    assert len({e[2] for e in errors}) == len(errors)
+
+
+def test_fgdc_lookup():
+    fgdc_lookup = fgdc_utils.get_fgdc_lookup()
+    assert fgdc_utils.get_fgdc_lookup() is fgdc_lookup
+    assert fgdc_lookup["cntper"]["long_name"] == "Contact Person"
+    assert fgdc_lookup.long_name("cntper") == "Contact Person"
+    assert fgdc_lookup.annotation("cntper").startswith("10.1.1 Contact Person")
+    assert fgdc_lookup.long_name("notanelement", "default") == "default"
+    assert "cntper" in fgdc_lookup
+    assert "notanelement" not in fgdc_lookup
+
+    with pytest.raises(TypeError):
+        fgdc_lookup["cntper"]["long_name"] = "changed"
@@ -0,0 +1,55 @@
+"""Unittests for core.search_utils"""
+
+
+import os
+import shutil
+
+import pytest
+
+from pymdwizard.core import search_utils
+
+
+def test_search_index(tmp_path):
+    data_dname = str(tmp_path / "data")
+    shutil.copytree("tests/data", data_dname)
+    polar_bears = os.path.join(data_dname, "USGS_ASC_PolarBears_FGDC.xml")
+
+    index = search_utils.SearchIndex(str(tmp_path / "index.sqlite"))
+    assert index.update(data_dname)["added"] == 6
+    assert index.update(data_dname)["unchanged"] == 6
+
+    results = index.search("bears")
+    assert [r.fname for r in results] == [polar_bears]
+    assert "[Bear]" in results[0].snippet
+    assert index.search("bears", fields=["placekey"]) == []
+    assert len(index.search("wind", fields=["themekey"], as_dataframe=True)) == 1
+
+    with open(polar_bears, "a") as f:
+        f.write("\n")
+    assert index.update(data_dname)["updated"] == 1
+
+    os.remove(polar_bears)
+    assert index.update(data_dname)["removed"] == 1
+    assert index.search("bears") == []
+    index.close()
+
+
+def test_search_errors(tmp_path):
+    data_dname = str(tmp_path / "data")
+    shutil.copytree("tests/data", data_dname)
+    bad_fname = os.path.join(data_dname, "not_xml.xml")
+    with open(bad_fname, "w") as f:
+        f.write("not xml")
+
+    index = search_utils.SearchIndex(str(tmp_path / "index.sqlite"))
+    counts = index.update(data_dname)
+    assert counts["added"] == 6 and counts["errors"] == 1
+    assert list(index.failed) == [bad_fname]
+
+    # words with punctuation are searched for as phrases
+    assert len(index.search("U.S.")) > 0
+    assert index.search("polar-bear") == index.search('"polar bear"')
+    assert index.search("polar-bear NOT zzz") == index.search('"polar bear"')
+    with pytest.raises(ValueError):
+        index.search("bear NOT")
+    index.close()
@@ -0,0 +1,26 @@
+from pytestqt import qtbot
+from lxml import etree
+
+from PyQt5.QtWidgets import QLineEdit
+
+from pymdwizard.gui import ContactInfo
+
+
+def test_make_tree(qtbot):
+    widget = ContactInfo.ContactInfo()
+    qtbot.addWidget(widget)
+    widget.findChild(QLineEdit, "fgdc_cntper").setText("Jay Diffendorfer")
+    before = etree.tostring(widget.to_xml())
+
+    # the child nodes are added to the tree with add_child(deepcopy=False)
+    tree = widget.make_tree(widget)
+    assert tree.tag == "cntinfo"
+    for parent in tree._walk():
+        assert parent.widget.objectName() == "fgdc_" + parent.tag
+        for child in parent.children:
+            assert child._parent is parent
+
+    # each tree gets its own nodes, and the widget contents are unchanged
+    tree_ids = set(id(node) for node in tree._walk())
+    assert not any(id(node) in tree_ids for node in widget.make_tree(widget)._walk())
+    assert etree.tostring(widget.to_xml()) == before
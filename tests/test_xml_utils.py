@@ -1,6 +1,9 @@
 """Unittests for core.data_io"""
 
 
+import os
+import marshal
+
 import pytest
 
 from lxml import etree
@@ -32,6 +35,22 @@ def test_node_to_dict():
     assert result["fgdc_cntperp"]["fgdc_cntper"] == "Colin Talbert"
 
 
+def test_element_to_df():
+    results = etree.fromstring(
+        "<r xmlns:n='http://itis'><n:item><n:tsn>1</n:tsn><!-- c -->"
+        "<n:name>a</n:name></n:item><n:item><n:tsn>2</n:tsn>"
+        "<n:rank>x</n:rank></n:item></r>"
+    )
+    df = xml_utils.element_to_df(results)
+    assert list(df.columns) == ["tsn", "name", "rank"]
+    assert list(df.tsn) == ["1", "2"]
+    assert df.name.isnull().tolist() == [False, True]
+    assert df.equals(
+        xml_utils.pd.DataFrame.from_dict(xml_utils.element_to_list(results))
+    )
+    assert xml_utils.element_to_df([element]).cntaddr[0]["city"] == "Fort Collins"
+
+
 def test_url_read():
     url = "https://www.sciencebase.gov/catalog/file/get/57d8779de4b090824ff9acfb?f=__disk__e1%2F7c%2Fa7%2Fe17ca734bf9ffd9ae0abeaaf0da208d457f72b3c&allowOpen=true"
     md = xml_utils.XMLRecord(url)
@@ -75,3 +94,418 @@ def test_find_replace():
         == 2
     )
     assert md.metadata.idinfo.descript.abstract.text.count("polar") == 2
+
+
+def test_lazy_record():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    lazy_md = xml_utils.XMLRecord(fname, lazy=True)
+
+    assert lazy_md.metadata._pending
+    assert (
+        lazy_md.metadata.idinfo.citation.citeinfo.geoform.text
+        == "Tabular Digital Data"
+    )
+    assert lazy_md.metadata.dataqual._pending
+    assert len(lazy_md.metadata.idinfo.keywords.place.placekey) == 3
+    assert lazy_md.metadata.idinfo.keywords.place.placekey[0].text == "Alaska"
+
+    with pytest.raises(AttributeError):
+        lazy_md.metadata.idinfo.notanelement
+
+    assert str(lazy_md) == str(md)
+
+
+def test_to_xml_matches_to_str():
+    fname = "tests/data/Onshore_Industrial_Wind_Turbine_Locations_for_the_United_States_through_July2013.xml"
+    md = xml_utils.XMLRecord(fname)
+    detailed = md.metadata.eainfo.detailed
+    for i in range(200):
+        detailed.add_child(detailed.attr[i % 5])
+    detailed.attr[0].attrdef.text = "special chars & < > é ​ end"
+
+    reparsed = xml_utils.string_to_node(md.metadata.to_str())
+    assert xml_utils.node_to_string(md.metadata.to_xml()) == xml_utils.node_to_string(
+        reparsed
+    )
+    assert md.metadata.copy() == md.metadata
+    assert md.metadata.to_str(xml_declaration=True) == xml_utils.node_to_string(
+        md.metadata.to_xml()
+    )
+
+    # an element added without a copy is wrapped, editing the node
+    # does not change it
+    source = etree.fromstring("<origin>source</origin>")
+    citeinfo = md.metadata.idinfo.citation.citeinfo
+    citeinfo.add_child(source, deepcopy=False)
+    citeinfo.children[-1].text = "edited"
+    assert source.text == "source"
+    assert citeinfo.to_xml()[-1].text == "edited"
+
+
+def test_digest():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    md2 = xml_utils.XMLRecord(fname)
+    assert md.metadata == md2.metadata
+    assert hash(md.metadata) == hash(md2.metadata)
+
+    md2.metadata.idinfo.citation.citeinfo.title.text = "changed"
+    assert md.metadata != md2.metadata
+    assert md.metadata.idinfo.descript == md2.metadata.idinfo.descript
+
+    md2.metadata.idinfo.citation.citeinfo.title.text = (
+        md.metadata.idinfo.citation.citeinfo.title.text
+    )
+    assert md.metadata == md2.metadata
+
+    md2.metadata.idinfo.citation.citeinfo.add_child(
+        xml_utils.XMLNode(tag="origin", text="new origin")
+    )
+    assert md.metadata != md2.metadata
+    md2.metadata.idinfo.citation.citeinfo.clear_children("origin")
+    md.metadata.idinfo.citation.citeinfo.clear_children("origin")
+    assert md.metadata == md2.metadata
+
+    md2.metadata.replace_string("Polar Bear", "Honey Badger")
+    assert md.metadata != md2.metadata
+
+    cntinfos = md.metadata.xpath("idinfo/ptcontac/cntinfo") + md2.metadata.xpath(
+        "idinfo/ptcontac/cntinfo"
+    )
+    assert len(xml_utils.dedup_nodes(cntinfos)) == 1
+    assert len(set(cntinfos)) == 1
+
+
+def test_digest_in_place_edits():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    md2 = xml_utils.XMLRecord(fname)
+    assert md.metadata == md2.metadata
+
+    citeinfo = md2.metadata.idinfo.citation.citeinfo
+    citeinfo.children.append(xml_utils.XMLNode(tag="origin", text="new origin"))
+    assert md.metadata != md2.metadata
+    assert citeinfo.origin[-1].text == "new origin"
+    citeinfo.children.pop()
+    assert md.metadata == md2.metadata
+
+    del citeinfo.children[0]
+    assert md.metadata != md2.metadata
+    assert citeinfo.digest() != md.metadata.idinfo.citation.citeinfo.digest()
+
+    # a node shared by two parents changes both of them
+    shared = xml_utils.XMLNode(tag="title", text="shared")
+    first = xml_utils.XMLNode(tag="citeinfo")
+    second = xml_utils.XMLNode(tag="citeinfo")
+    first.add_child(shared, deepcopy=False)
+    second.add_child(shared, deepcopy=False)
+    assert first == second
+    before = first.digest()
+    shared.text = "changed"
+    assert first.digest() != before
+    assert first == second
+
+
+def test_diff_nodes():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    md2 = xml_utils.XMLRecord(fname)
+    assert xml_utils.diff_nodes(md, md2) == []
+
+    citeinfo = md2.metadata.idinfo.citation.citeinfo
+    citeinfo.title.text = "changed"
+    citeinfo.add_child(xml_utils.XMLNode(tag="origin", text="new origin"), index=0)
+    md2.metadata.clear_children("metainfo")
+
+    changes = xml_utils.diff_nodes(fname, md2)
+    assert [c.change for c in changes] == ["inserted", "text", "deleted"]
+    assert changes[0].new_xpath == "metadata/idinfo/citation/citeinfo/origin[1]"
+    assert changes[1].old_xpath == "metadata/idinfo/citation/citeinfo/title"
+    assert changes[1].new_text == "changed"
+    assert changes[2].old_xpath == "metadata/metainfo"
+
+    keywords = md2.metadata.idinfo.keywords
+    keywords.children = keywords.children[1:] + keywords.children[:1]
+    df = xml_utils.diff_nodes(md, md2, as_dataframe=True)
+    assert "moved" in df.change.values
+
+
+def test_xpath_march():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    assert xml_utils.parse_xpath("idinfo/keywords/theme[2]/") == (
+        ("idinfo", "idinfo", 0, False),
+        ("keywords", "keywords", 0, False),
+        ("theme[2]", "theme", 1, True),
+    )
+
+    title = md.metadata.idinfo.citation.citeinfo.title
+    assert md.metadata.xpath_march("idinfo/citation/citeinfo/title/a/b") == [title]
+    assert md.metadata.xpath_march("idinfo/citation/citeinfo/title") == [title]
+    assert md.metadata.xpath_march("nothere/idinfo") == []
+    assert md.metadata.xpath("idinfo[x]/citation") == []
+
+    # element backed nodes are searched with compiled lxml xpaths
+    assert md.metadata.get_element() is md.metadata.element
+    attrlabls = xml_utils.search_xpath(md, "//attrlabl", only_first=False)
+    assert len(attrlabls) == len(md.metadata.eainfo.xpath("detailed/attr"))
+    title.text = "changed"
+    assert md.metadata.get_element() is not md.metadata.element
+    new_title = xml_utils.search_xpath(md.metadata, "idinfo/citation/citeinfo/title")
+    assert new_title.text == "changed"
+
+    # editing children in place is seen by the next search
+    md2 = xml_utils.XMLRecord(fname)
+    citeinfo = md2.metadata.idinfo.citation.citeinfo
+    assert xml_utils.search_xpath(md2, "idinfo/citation/citeinfo/edition") is None
+    citeinfo.children.append(xml_utils.XMLNode(tag="edition", text="2"))
+    edition = xml_utils.search_xpath(md2, "idinfo/citation/citeinfo/edition")
+    assert edition.text == "2"
+    del citeinfo.children[-1]
+    assert xml_utils.search_xpath(md2, "idinfo/citation/citeinfo/edition") is None
+
+    # the text found is the stripped node text, edited or not
+    node = xml_utils.XMLNode("<a><b>  spaced  </b><c>kept</c></a>")
+    assert node.get_element() is node.element
+    assert xml_utils.search_xpath(node, "b").text == "spaced"
+    assert xml_utils.search_xpath(node.c, ".").text == "kept"
+    node.add_child(xml_utils.XMLNode(tag="d", text="new"))
+    assert xml_utils.search_xpath(node, "b").text == "spaced"
+
+
+def test_find_all():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname, index=True)
+    md_walk = xml_utils.XMLRecord(fname)
+    assert len(md.find_all("attrlabl")) == 87
+    assert [n.text for n in md.find_all("cntemail")] == [
+        n.text for n in md_walk.find_all("cntemail")
+    ]
+
+    citeinfo = md.metadata.idinfo.citation.citeinfo
+    new_origin = xml_utils.XMLNode(tag="origin", text="new origin")
+    citeinfo.add_child(new_origin, deepcopy=False)
+    assert md.find_all("origin")[-1] is new_origin
+    citeinfo.clear_children("origin")
+    assert new_origin not in md.find_all("origin")
+
+    md.metadata.clear_children("eainfo")
+    assert md.find_all("attrlabl") == []
+
+
+def test_replace_strings():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    counts = md.metadata.replace_strings(
+        {"Polar Bear": "Honey Badger", "Bear": "Cub", "Alaska": "AK", "zzz": "y"}
+    )
+    assert counts == {"Polar Bear": 4, "Alaska": 17, "Bear": 1, "zzz": 0}
+    assert md.metadata.find_string("Polar Bear") == []
+    assert len(md.metadata.find_string("Honey Badger")) == 4
+
+    element = xml_utils.fname_to_node(fname)
+    replacer = xml_utils.StringReplacer({r"(\d{4})-(\d\d)": r"\2/\1"}, regex=True)
+    assert xml_utils.replace_strings(element, replacer) == {r"(\d{4})-(\d\d)": 5}
+    counts = xml_utils.replace_strings(element, {"alaska": "AK"}, ignorecase=True)
+    assert counts == {"alaska": 17}
+
+
+def test_replace_strings_regex_features():
+    lookahead = xml_utils.StringReplacer({r"foo(?=bar)": "X", "baz": "Y"}, regex=True)
+    counts = {}
+    assert lookahead.replace("foobar foo baz", counts) == "Xbar foo Y"
+    assert counts == {r"foo(?=bar)": 1, "baz": 1}
+
+    backreference = xml_utils.StringReplacer({r"(\d)\1": r"<\1>"}, regex=True)
+    assert backreference.replace("11 12 33") == "<1> 12 <3>"
+
+    named = xml_utils.StringReplacer(
+        [(r"(?P<run>a+)", r"[\g<run>]"), (r"(?P<run>b+)", r"{\g<run>}")], regex=True
+    )
+    counts = {}
+    assert named.replace("aab bba", counts) == "[aa]{b} {bb}[a]"
+    assert counts == {r"(?P<run>a+)": 2, r"(?P<run>b+)": 2}
+
+
+def test_record_template(tmp_path):
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    md.metadata.idinfo.citation.citeinfo.title.text = "Stake {StakeNo} {Lat:.3f} {x y}"
+    template = xml_utils.RecordTemplate(
+        md, fields={"idinfo/spdom/bounding/northbc": "{Lat}"}
+    )
+    assert template.placeholders == {"StakeNo", "Lat"}
+
+    rows = [{"StakeNo": 694, "Lat": 36.39194}, {"StakeNo": 1, "Lat": 1}]
+    fnames = template.save_all(rows, str(tmp_path / "stake_{StakeNo}.xml"))
+    assert fnames == [str(tmp_path / "stake_694.xml"), str(tmp_path / "stake_1.xml")]
+    results = template.iter_save_all(rows, str(tmp_path / "iter_{StakeNo}.xml"))
+    assert not (tmp_path / "iter_694.xml").exists()
+    assert next(results) == str(tmp_path / "iter_694.xml")
+    assert (tmp_path / "iter_694.xml").exists()
+
+    md.metadata.idinfo.citation.citeinfo.title.text = "Stake 694 36.392 {x y}"
+    md.metadata.idinfo.spdom.bounding.northbc.text = "36.39194"
+    md.save(str(tmp_path / "expected.xml"))
+    expected = (tmp_path / "expected.xml").read_bytes()
+    assert (tmp_path / "stake_694.xml").read_bytes() == expected
+
+
+def test_iter_sections():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    sections = [xpath for xpath, element in xml_utils.iter_sections(fname)]
+    assert sections == [
+        "metadata/idinfo[1]",
+        "metadata/dataqual[1]",
+        "metadata/spref[1]",
+        "metadata/eainfo[1]",
+        "metadata/distinfo[1]",
+        "metadata/metainfo[1]",
+    ]
+
+    record = xml_utils.fname_to_node(fname)
+    count = 0
+    for xpath, attr in xml_utils.iter_sections(fname, ["eainfo/detailed/attr"]):
+        expected = record.xpath("/" + xpath)[0]
+        assert attr.findtext("attrlabl") == expected.findtext("attrlabl")
+        # everything that has already been processed is cleared
+        previous = attr.getprevious()
+        assert previous is None or len(previous) == 0
+        count += 1
+    assert count == 87
+
+
+def test_extract_records(tmp_path):
+    bad_fname = tmp_path / "bad.xml"
+    bad_fname.write_text("<metadata><idinfo>")
+    entity_fname = tmp_path / "entity.xml"
+    entity_fname.write_text('<!DOCTYPE x [<!ENTITY a "b">]><metadata>&a;</metadata>')
+    fnames = ["tests/data/*.xml", str(bad_fname), str(entity_fname)]
+    df = xml_utils.extract_records(fnames, processes=1)
+    assert len(df) == 5
+    polar_bears = df[df.fname.str.endswith("PolarBears_FGDC.xml")].iloc[0]
+    assert polar_bears.westbc == "178.2167"
+    assert polar_bears.themekey == "Polar Bear; Ursus maritimum; maternal denning"
+    assert df[df.fname == str(bad_fname)].error.iloc[0]
+    assert df[df.fname == str(entity_fname)].error.iloc[0]
+
+    df2 = xml_utils.extract_records(
+        fnames, {"attrs": "count(eainfo/detailed/attr)"}, processes=2, sep=None
+    )
+    assert list(df2.columns) == ["fname", "error", "attrs"]
+    assert df2["attrs"][df2.fname == polar_bears.fname].iloc[0] == 87
+
+
+def test_record_cache(tmp_path):
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    cache = xml_utils.RecordCache(str(tmp_path / "cache"))
+    md = xml_utils.XMLRecord(fname, cache=cache)
+    assert cache.get(fname) is not None
+
+    md_cached = xml_utils.XMLRecord(fname, cache=cache)
+    assert "record" not in md_cached.__dict__
+    assert md_cached.metadata == md.metadata
+    assert md_cached.serialize() == md.serialize()
+    assert md_cached.record.getroot().tag == "metadata"
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.get(fname) is None
+
+
+def test_record_cache_size(tmp_path, monkeypatch):
+    # put only lists the cache directory when it needs to evict
+    element = xml_utils.XMLRecord("tests/data/USGS_ASC_PolarBears_FGDC.xml")._root
+    entry_size = len(marshal.dumps(xml_utils._element_tokens(element)))
+    cache = xml_utils.RecordCache(str(tmp_path / "cache"), max_bytes=entry_size * 10)
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(
+        xml_utils.os, "scandir", lambda path: scans.append(path) or scandir(path)
+    )
+    for i in range(25):
+        fname = tmp_path / "{}.xml".format(i)
+        fname.touch()
+        cache.put(str(fname), element)
+    entries = list(scandir(cache.dname))
+    assert len(entries) <= 10
+    assert sum(entry.stat().st_size for entry in entries) == cache._size
+    assert len(scans) < 10
+
+
+def test_record_cache_is_private(tmp_path):
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    cache = xml_utils.RecordCache(str(tmp_path / "cache"))
+    cache.put(fname, xml_utils.fname_to_node(fname).getroot())
+
+    # entries are marshal data, a damaged entry is treated as a miss
+    (entry,) = os.listdir(cache.dname)
+    with open(os.path.join(cache.dname, entry), "wb") as f:
+        f.write(b"\x80\x04not marshal data")
+    assert cache.get(fname) is None
+
+    if hasattr(os, "getuid"):
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        os.chmod(str(shared), 0o777)
+        with pytest.raises(OSError):
+            xml_utils._private_dir(str(shared))
+        xml_utils._private_dir(str(tmp_path / "private"))
+        assert os.stat(str(tmp_path / "private")).st_mode & 0o777 == 0o700
+
+
+def test_node_attributes():
+    fname = "tests/data/USGS_ASC_PolarBears_FGDC.xml"
+    md = xml_utils.XMLRecord(fname)
+    template = xml_utils.XMLRecord(
+        "tests/data/Onshore_Industrial_Wind_Turbine_Locations_for_the_United_States_through_July2013.xml"
+    )
+    assert not hasattr(md.metadata, "__dict__")
+    assert md.metadata.metadata is md.metadata
+
+    # assigning a node to the tag of a single child replaces it
+    spdom = md.metadata.idinfo.spdom
+    spdom.bounding = template.metadata.idinfo.spdom.bounding
+    assert spdom.children[1] is template.metadata.idinfo.spdom.bounding
+    assert "-180.000000" in md.metadata.to_str()
+
+    # other attributes are kept without changing the record
+    spdom.widget = "a widget"
+    spdom.note = "a note"
+    assert (spdom.widget, spdom.note) == ("a widget", "a note")
+    assert len(spdom.children) == 2
+    assert "a note" not in spdom.to_str()
+
+    # the tag lookup follows changes to the children
+    detailed = md.metadata.eainfo.detailed
+    assert len(detailed.attr) == 87
+    detailed.children.pop()
+    assert len(detailed.attr) == 86
+    detailed.clear_children("attr")
+    with pytest.raises(AttributeError):
+        detailed.attr
+
+
+def test_sanitize(tmp_path):
+    xml = (
+        "<metadata><idinfo><descript><abstract>a​b­c</abstract>"
+        "<purpose>ok</purpose></descript><keywords><theme><themekey>x"
+        "</themekey><themekey>y﻿</themekey></theme></keywords>"
+        "</idinfo></metadata>"
+    )
+    expected = [
+        "metadata/idinfo/descript/abstract",
+        "metadata/idinfo/keywords/theme/themekey[2]",
+    ]
+    assert xml_utils.remove_control_characters("a\x0bb\tc\n") == "ab\tc\n"
+
+    md = xml_utils.XMLRecord(xml, sanitize=True)
+    assert md.sanitized == expected
+    assert md.metadata.idinfo.descript.abstract.text == "abc"
+
+    md = xml_utils.XMLRecord(xml)
+    assert md.sanitized == []
+    md.save(str(tmp_path / "out.xml"), sanitize=True)
+    assert md.sanitized == expected
+    assert md.sanitize() == []